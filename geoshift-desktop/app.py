@@ -6,7 +6,9 @@ class AppState:
         
         # Analysis state
         self.selected_analysis_type = 'landuse'  # Default
-        self.change_mask = None
+        self.change_mask = None  # Bit-packed, see set_change_mask()
+        self.change_mask_shape = None
+        self.change_mask_path = None  # Rendered overlay PNG for the map
         self.change_results = None
         
         # UI State
@@ -16,10 +18,21 @@ class AppState:
         """Reset all state."""
         self.raster_a = None
         self.raster_b = None
+        self.clear_analysis()
+    
+    def clear_analysis(self):
+        """Drop the change detection results."""
         self.change_mask = None
+        self.change_mask_shape = None
+        self.change_mask_path = None
         self.change_results = None
         self.change_visible = True
     
     def has_both_images(self) -> bool:
         """Check if both images are loaded."""
         return self.raster_a is not None and self.raster_b is not None
+    
+    def set_change_mask(self, packed, shape):
+        """Store a change mask packed with engine.change_tools.pack_mask (1 bit per pixel)."""
+        self.change_mask = packed
+        self.change_mask_shape = shape
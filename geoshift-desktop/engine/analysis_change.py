@@ -41,11 +41,14 @@ def detect_deforestation(img_a: np.ndarray, img_b: np.ndarray) -> Tuple[np.ndarr
         green_a = img_a[:, :, 1]
         green_b = img_b[:, :, 1]
         
-        # Detect areas where green decreased significantly
-        diff = green_a.astype(np.int16) - green_b.astype(np.int16)
+        # Detect areas where green decreased significantly. Unsafe casting
+        # keeps float rasters working like the old astype(np.int16) copies.
+        diff = np.subtract(green_a, green_b, dtype=np.int16, casting='unsafe')
         
-        # Forest loss: significant decrease in green
-        change_mask = (diff > 40).astype(np.uint8) * 255
+        # Forest loss: significant decrease in green (compare straight into the mask buffer)
+        change_mask = np.empty(diff.shape, dtype=np.uint8)
+        np.greater(diff, 40, out=change_mask.view(bool))
+        change_mask *= 255
     else:
         # Fallback to simple difference
         change_mask, stats = detect_landuse_change(img_a, img_b)
@@ -73,11 +76,13 @@ def detect_water_change(img_a: np.ndarray, img_b: np.ndarray) -> Tuple[np.ndarra
         blue_b = img_b[:, :, 0]
         
         # Detect water in each image
-        water_a = (blue_a > 100).astype(np.uint8)
-        water_b = (blue_b > 100).astype(np.uint8)
+        water_a = blue_a > 100
+        water_b = blue_b > 100
         
-        # Change: XOR to find differences
-        change_mask = cv2.bitwise_xor(water_a, water_b) * 255
+        # Change: XOR to find differences, written straight into the mask buffer
+        change_mask = np.empty(water_a.shape, dtype=np.uint8)
+        np.not_equal(water_a, water_b, out=change_mask.view(bool))
+        change_mask *= 255
     else:
         change_mask, stats = detect_landuse_change(img_a, img_b)
         return change_mask, stats
@@ -36,32 +36,62 @@ def calculate_change_area(mask_before: np.ndarray, mask_after: np.ndarray, trans
         "change_type": "gain" if after_pixels > before_pixels else "loss" if after_pixels < before_pixels else "no-change"
     }
 
+# Colour per change code: bit 0 = in A, bit 1 = in B
+_CHANGE_PALETTE = np.array([
+    [0, 0, 0],      # No change
+    [255, 0, 0],    # Loss: in A but not in B (Red)
+    [0, 255, 0],    # Gain: in B but not in A (Green)
+    [255, 255, 0],  # Modified: in both (Yellow)
+], dtype=np.uint8)
+
 def generate_change_map(mask_a: np.ndarray, mask_b: np.ndarray) -> np.ndarray:
     """
     Generate a color-coded change map.
     Red = loss, Green = gain, Yellow = modified, Gray = no change
     """
-    # Create RGB change map
-    h, w = mask_a.shape[:2]
-    change_map = np.zeros((h, w, 3), dtype=np.uint8)
-    
-    # Normalize masks to binary
-    mask_a_bin = (mask_a > 0).astype(np.uint8)
-    mask_b_bin = (mask_b > 0).astype(np.uint8)
-    
-    # Loss: in A but not in B (Red)
-    loss = (mask_a_bin == 1) & (mask_b_bin == 0)
-    change_map[loss] = [255, 0, 0]
-    
-    # Gain: in B but not in A (Green)
-    gain = (mask_a_bin == 0) & (mask_b_bin == 1)
-    change_map[gain] = [0, 255, 0]
-    
-    # Modified: in both (Yellow)
-    modified = (mask_a_bin == 1) & (mask_b_bin == 1)
-    change_map[modified] = [255, 255, 0]
-    
-    return change_map
+    # Combine both binary masks into a 2-bit code per pixel, then map
+    # every code to its colour in a single palette lookup
+    code = (mask_b > 0).view(np.uint8)
+    code <<= 1
+    code |= (mask_a > 0).view(np.uint8)
+    return _CHANGE_PALETTE[code]
+
+def change_map_to_rgba(change_map: np.ndarray, alpha: int = 180) -> np.ndarray:
+    """
+    Convert a color-coded change map to an RGBA overlay.
+    Pixels with no change (black) become fully transparent.
+    """
+    h, w = change_map.shape[:2]
+    rgba = np.empty((h, w, 4), dtype=np.uint8)
+    rgba[..., :3] = change_map
+    np.multiply(change_map.any(axis=2), alpha, out=rgba[..., 3], casting='unsafe')
+    return rgba
+
+def pack_mask(mask: np.ndarray) -> np.ndarray:
+    """
+    Pack a binary mask to 1 bit per pixel (8x smaller than uint8).
+    Keep mask.shape alongside; unpack_mask needs it to trim row padding.
+    """
+    return np.packbits(mask > 0, axis=-1)
+
+def unpack_mask(packed: np.ndarray, shape) -> np.ndarray:
+    """
+    Expand a mask packed by pack_mask back to uint8 (0/255).
+    """
+    mask = np.unpackbits(packed, axis=-1, count=shape[-1])
+    mask *= 255
+    return mask
+
+def downscale_mask(mask: np.ndarray, max_size: int) -> np.ndarray:
+    """
+    Shrink a 2D mask so its longest side is at most max_size.
+    Max-pools over square blocks, so a block with any changed pixel stays set.
+    """
+    factor = -(-max(mask.shape) // max_size)
+    if factor <= 1:
+        return mask
+    rows = np.maximum.reduceat(mask, np.arange(0, mask.shape[0], factor), axis=0)
+    return np.maximum.reduceat(rows, np.arange(0, mask.shape[1], factor), axis=1)
 
 def classify_change_type(diff_mask: np.ndarray) -> str:
     """
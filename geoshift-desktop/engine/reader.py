@@ -4,8 +4,12 @@ from rasterio.warp import transform_bounds
 import numpy as np
 from PIL import Image
 import os
+from collections import namedtuple
 from engine.logger import logger
 
+# BoundingBox-like object for reprojected (WGS84) bounds
+BBox = namedtuple('BBox', ['left', 'bottom', 'right', 'top'])
+
 def load_raster(path, max_size=1024):
     """
     Loads a raster file metadata and generates a downsampled preview.
@@ -30,9 +34,6 @@ def load_raster(path, max_size=1024):
                 try:
                     wgs84_bounds = transform_bounds(crs, 'EPSG:4326', *bounds)
                     logger.info(f"Reprojected bounds to WGS84: {wgs84_bounds}")
-                    # Create a BoundingBox-like object
-                    from collections import namedtuple
-                    BBox = namedtuple('BBox', ['left', 'bottom', 'right', 'top'])
                     bounds_wgs84 = BBox(*wgs84_bounds)
                 except Exception as e:
                     logger.warning(f"Could not reproject bounds: {e}. Using original bounds.")
@@ -54,7 +55,7 @@ def load_raster(path, max_size=1024):
             if count >= 3:
                 preview_data = src.read([1, 2, 3], out_shape=(3, out_shape[1], out_shape[2]))
             else:
-                preview_data = src.read(1, out_shape=(1, out_shape[1], out_shape[2]))
+                preview_data = src.read([1], out_shape=(1, out_shape[1], out_shape[2]))
             
             # Create valid data mask
             if nodata is not None:
@@ -67,23 +68,26 @@ def load_raster(path, max_size=1024):
                 else:
                     valid_mask = np.ones_like(preview_data, dtype=bool)
             
-            # Normalize for preview using percentile-based contrast stretching
-            preview_data = preview_data.astype(float)
+            # Normalize for preview using percentile-based contrast stretching.
+            # Work in float32 and in place to avoid float64 temporaries.
+            preview_data = preview_data.astype(np.float32)
             
             # Use valid pixels for percentile calculation
             valid_pixels = preview_data[valid_mask]
             
             if valid_pixels.size > 0:
-                p_low = np.nanpercentile(valid_pixels, 2)
-                p_high = np.nanpercentile(valid_pixels, 98)
+                # One call partitions the data once for both percentiles
+                p_low, p_high = np.nanpercentile(valid_pixels, [2, 98])
                 
                 logger.info(f"Preview data range: min={np.nanmin(preview_data):.2f}, max={np.nanmax(preview_data):.2f}")
                 logger.info(f"Contrast stretch (valid pixels): 2nd percentile={p_low:.2f}, 98th percentile={p_high:.2f}")
                 
                 if p_high > p_low:
                     # Clip to percentile range and normalize to 0-255
-                    preview_data = np.clip(preview_data, p_low, p_high)
-                    preview_data = ((preview_data - p_low) / (p_high - p_low) * 255).astype(np.uint8)
+                    np.clip(preview_data, p_low, p_high, out=preview_data)
+                    preview_data -= p_low
+                    preview_data *= 255.0 / (p_high - p_low)
+                    preview_data = preview_data.astype(np.uint8)
                     
                     # Check if image is still very dark (mean < 50), apply additional enhancement
                     mean_val = np.mean(preview_data[valid_mask])
@@ -92,8 +96,12 @@ def load_raster(path, max_size=1024):
                     if mean_val < 50:
                         logger.info("Image appears dark, applying gamma correction")
                         gamma = 1.5
-                        preview_data = np.power(preview_data / 255.0, 1/gamma) * 255
-                        preview_data = preview_data.astype(np.uint8)
+                        # 256-entry float32 table instead of a float64 power over every pixel
+                        gamma_lut = np.arange(256, dtype=np.float32)
+                        gamma_lut /= 255.0
+                        np.power(gamma_lut, np.float32(1 / gamma), out=gamma_lut)
+                        gamma_lut *= 255
+                        preview_data = gamma_lut.astype(np.uint8)[preview_data]
                 else:
                     logger.warning("No contrast in image data, using zeros")
                     preview_data = np.zeros_like(preview_data, dtype=np.uint8)
@@ -105,30 +113,26 @@ def load_raster(path, max_size=1024):
             # For RGB, pixel is valid if all bands are valid (or any? usually all)
             # Let's say valid if ANY band is valid (conservative) or ALL?
             # Usually nodata is set on all bands.
+            # Build the RGBA array directly rather than splitting/merging PIL bands
+            rgba = np.empty((preview_data.shape[1], preview_data.shape[2], 4), dtype=np.uint8)
             if count >= 3:
+                rgba[..., :3] = reshape_as_image(preview_data)
                 # Collapse mask to 2D: valid if all channels are valid
-                alpha_mask = np.all(valid_mask, axis=0).astype(np.uint8) * 255
-                
-                img = reshape_as_image(preview_data)
-                img_rgb = Image.fromarray(img, mode='RGB')
-                alpha = Image.fromarray(alpha_mask, mode='L')
-                image = Image.merge('RGBA', (*img_rgb.split(), alpha))
+                np.multiply(np.all(valid_mask, axis=0), 255, out=rgba[..., 3], casting='unsafe')
             else:
-                # Single band
-                alpha_mask = valid_mask[0].astype(np.uint8) * 255
-                
-                img_gray = Image.fromarray(preview_data[0], mode='L')
-                alpha = Image.fromarray(alpha_mask, mode='L')
-                # Convert grayscale to RGBA
-                image = Image.merge('RGBA', (img_gray, img_gray, img_gray, alpha))
+                # Single band: replicate grey into RGB
+                rgba[..., :3] = preview_data[0][..., np.newaxis]
+                np.multiply(valid_mask[0], 255, out=rgba[..., 3], casting='unsafe')
                 logger.info("Converted single-band image to RGBA with transparency")
+            image = Image.fromarray(rgba, mode='RGBA')
             
             # Save preview
             preview_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'assets', 'previews')
             os.makedirs(preview_dir, exist_ok=True)
             preview_filename = f"preview_{os.path.basename(path)}.png"
             preview_path = os.path.join(preview_dir, preview_filename)
-            image.save(preview_path)
+            # Previews are a local display cache: favour encode speed over file size
+            image.save(preview_path, compress_level=1)
             logger.info(f"Saved preview to: {preview_path}")
             
             return {
@@ -16,6 +16,11 @@ def main():
     # Ensure High DPI scaling
     os.environ["QT_AUTO_SCREEN_SCALE_FACTOR"] = "1"
     
+    # Bound GDAL's process-wide block cache (MB) so long panning sessions over
+    # large rasters don't grow memory without limit. GDAL reads this once, on
+    # first use, so it must be set before any raster is opened.
+    os.environ.setdefault("GDAL_CACHEMAX", "512")
+    
     app = QApplication(sys.argv)
     app.setStyle("Fusion")
     
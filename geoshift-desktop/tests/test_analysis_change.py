@@ -0,0 +1,17 @@
+import numpy as np
+from engine.analysis_change import detect_deforestation
+
+
+def test_detect_deforestation_accepts_float_rasters():
+    """Test that float inputs are truncated to int16 like integer inputs."""
+    img_a = np.zeros((1, 2, 3), dtype=np.float32)
+    img_b = np.zeros((1, 2, 3), dtype=np.float32)
+    img_a[0, 0, 1] = 150.7
+    img_b[0, 0, 1] = 60.2
+    img_a[0, 1, 1] = 80.0
+    img_b[0, 1, 1] = 70.0
+
+    mask, stats = detect_deforestation(img_a, img_b)
+
+    np.testing.assert_array_equal(mask, [[255, 0]])
+    assert stats["deforested_pixels"] == 1
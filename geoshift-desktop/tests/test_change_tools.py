@@ -0,0 +1,42 @@
+import numpy as np
+from engine.change_tools import generate_change_map, change_map_to_rgba, pack_mask, unpack_mask, downscale_mask
+
+
+def test_change_map_to_rgba_transparent_where_unchanged():
+    mask_a = np.array([[0, 255], [255, 0]], dtype=np.uint8)
+    mask_b = np.array([[0, 0], [255, 255]], dtype=np.uint8)
+
+    rgba = change_map_to_rgba(generate_change_map(mask_a, mask_b))
+
+    assert rgba.shape == (2, 2, 4)
+    assert rgba.dtype == np.uint8
+    # No change: fully transparent black
+    np.testing.assert_array_equal(rgba[0, 0], [0, 0, 0, 0])
+    # Loss (red), modified (yellow), gain (green) keep their color at alpha 180
+    np.testing.assert_array_equal(rgba[0, 1], [255, 0, 0, 180])
+    np.testing.assert_array_equal(rgba[1, 0], [255, 255, 0, 180])
+    np.testing.assert_array_equal(rgba[1, 1], [0, 255, 0, 180])
+
+
+def test_pack_mask_round_trip():
+    mask = np.zeros((3, 11), dtype=np.uint8)
+    mask[0, 0] = mask[1, 10] = mask[2, 5] = 255
+
+    packed = pack_mask(mask)
+
+    assert packed.shape == (3, 2)
+    np.testing.assert_array_equal(unpack_mask(packed, mask.shape), mask)
+
+
+def test_downscale_mask_keeps_isolated_changes():
+    mask = np.zeros((1000, 750), dtype=np.uint8)
+    mask[517, 3] = 255
+    mask[999, 749] = 255
+
+    small = downscale_mask(mask, 100)
+
+    assert small.shape == (100, 75)
+    assert small.dtype == np.uint8
+    assert np.count_nonzero(small) == 2
+    assert small[51, 0] == 255 and small[99, 74] == 255
+    assert downscale_mask(small, 100) is small
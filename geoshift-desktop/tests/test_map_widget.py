@@ -1,9 +1,14 @@
+import os
+import tempfile
 import pytest
 import numpy as np
 from unittest.mock import Mock, patch
+from PyQt5.QtCore import QUrl
 from PyQt5.QtWidgets import QApplication
 from ui.map_widget import MapWidget
 from collections import namedtuple
+import folium
+from PIL import Image
 
 # Create a simple Bounds namedtuple for testing
 Bounds = namedtuple('Bounds', ['left', 'right', 'top', 'bottom'])
@@ -42,6 +47,28 @@ def make_raster(name, shape=(10, 10)):
     }
 
 
+def make_preview_raster(tmp_path, name, filename="preview.png"):
+    """Helper to create a raster dict backed by a real preview PNG."""
+    preview_path = tmp_path / filename
+    Image.new("RGBA", (4, 4)).save(preview_path)
+    raster = make_raster(name)
+    raster["preview_path"] = str(preview_path)
+    return raster
+
+
+@pytest.fixture
+def live_map(qapp, tmp_path):
+    """Create a MapWidget that renders for real, with the web view mocked out.
+
+    Yields the widget and a raster dict whose preview exists on disk.
+    """
+    widget = MapWidget()
+    widget.web_view.setUrl = Mock()
+    widget.web_view.page = Mock()
+    yield widget, make_preview_raster(tmp_path, "Image A")
+    widget.deleteLater()
+
+
 def test_show_comparison_sets_comparison_mode(map_widget):
     """Test that show_comparison sets comparison_mode to True."""
     raster_a = make_raster("Image A")
@@ -117,3 +144,138 @@ def test_show_comparison_handles_missing_rasters(map_widget):
     assert map_widget.comparison_mode is False
     assert len(map_widget.layers) == 0
 
+
+def test_show_comparison_rejects_raster_without_bounds(map_widget):
+    """Test that show_comparison leaves the map untouched for incomplete rasters."""
+    raster_a = make_raster("Image A")
+    raster_b = make_raster("Image B")
+    del raster_b["bounds"]
+
+    map_widget.show_comparison(raster_a, raster_b)
+
+    assert map_widget.comparison_mode is False
+    assert len(map_widget.layers) == 0
+    map_widget._render_map.assert_not_called()
+
+
+def test_render_map_reuses_cached_html(live_map):
+    """Test that re-rendering an unchanged layer set skips Folium."""
+    widget, raster = live_map
+    widget.add_image_layer("Image A", raster, render=False)
+
+    with patch('ui.map_widget.folium.Map', wraps=folium.Map) as map_cls:
+        widget._render_map_now()
+        widget.layers["Image A"]["opacity"] = 0.5
+        widget._render_map_now()
+        widget.layers["Image A"]["opacity"] = 1.0
+        widget._render_map_now()
+
+    assert map_cls.call_count == 2
+    assert widget.web_view.setUrl.call_count == 3
+
+
+def test_render_map_skips_unchanged_live_page(qapp, live_map):
+    """Test that re-rendering the state already on screen does nothing."""
+    widget, raster = live_map
+    widget.add_image_layer("Image A", raster)
+    qapp.processEvents()
+    widget._render_map_now()
+
+    widget.web_view.setUrl.assert_called_once()
+
+
+def test_show_comparison_swaps_single_side_in_place(qapp, live_map, tmp_path):
+    """Test that replacing only Image B updates the live map via JavaScript."""
+    widget, _ = live_map
+    rasters = [make_preview_raster(tmp_path, name, f"{name}.png") for name in ("a", "b", "b2")]
+    for raster in rasters:
+        raster.pop("name")
+
+    widget.show_comparison(rasters[0], rasters[1])
+    qapp.processEvents()
+    widget.show_comparison(rasters[0], rasters[2])
+
+    widget.web_view.setUrl.assert_called_once()
+    js = widget.web_view.page().runJavaScript.call_args[0][0]
+    assert js.startswith('setSide("B"')
+    assert "b2.png" in js
+    assert widget.layers["Image B"]["raster_data"] is rasters[2]
+
+
+def test_render_map_loads_page_from_temp_file(qapp, live_map):
+    """Test that the rendered page is written to disk and removed on close."""
+    widget, raster = live_map
+    widget.add_image_layer("Image A", raster)
+    qapp.processEvents()
+
+    url = widget.web_view.setUrl.call_args[0][0]
+    with open(url.toLocalFile(), encoding='utf-8') as f:
+        assert "preview.png" in f.read()
+
+    widget.close()
+    assert not os.path.exists(url.toLocalFile())
+
+
+def test_toggle_layer_visibility_updates_live_map(qapp, live_map):
+    """Test that hiding a layer on a rendered map uses JavaScript, not a re-render."""
+    widget, raster = live_map
+    widget.add_image_layer("Image A", raster)
+    qapp.processEvents()
+
+    widget.toggle_layer_visibility("Image A", False)
+    widget.set_layer_opacity("Image A", 0.5)
+
+    widget.web_view.setUrl.assert_called_once()
+    calls = [c[0][0] for c in widget.web_view.page().runJavaScript.call_args_list]
+    layer_var = widget._js_layers["Image A"][0]
+    assert calls == [
+        f"{widget._js_map}.removeLayer({layer_var});",
+        f"{layer_var}.setOpacity(0.5);",
+    ]
+
+
+def test_render_map_coalesces_repeated_requests(qapp, live_map, tmp_path):
+    """Test that several render requests in one event-loop turn build one page."""
+    widget, _ = live_map
+    rasters = [make_preview_raster(tmp_path, name, f"{name}.png") for name in ("Image A", "Image B")]
+
+    widget.add_image_layer("Image A", rasters[0])
+    widget.add_image_layer("Image B", rasters[1])
+    widget.web_view.setUrl.assert_not_called()
+    qapp.processEvents()
+
+    widget.web_view.setUrl.assert_called_once()
+    assert set(widget._js_layers) == {"Image A", "Image B"}
+
+
+def test_get_image_url_serves_large_png_as_webp(map_widget, tmp_path):
+    """Test that large PNG previews are transcoded once and linked as WebP."""
+    preview_path = tmp_path / "large.png"
+    noise = np.random.randint(0, 255, size=(400, 400, 4), dtype=np.uint8)
+    Image.fromarray(noise, mode="RGBA").save(preview_path)
+
+    url = map_widget._get_image_url(str(preview_path), lossy=True)
+
+    assert ".webp?v=" in url
+    webp_path = QUrl(url).toLocalFile()
+    assert os.path.dirname(webp_path) == tempfile.gettempdir()
+    assert map_widget._get_image_url(str(preview_path), lossy=True) == url
+
+    # A fresh URL cache reuses the up-to-date WebP instead of re-encoding it
+    map_widget._url_cache.clear()
+    with patch('ui.map_widget.Image.open') as image_open:
+        assert map_widget._get_image_url(str(preview_path), lossy=True) == url
+    image_open.assert_not_called()
+    os.remove(webp_path)
+
+
+def test_get_image_url_keeps_masks_as_png(map_widget, tmp_path):
+    """Test that large mask overlays are never re-encoded lossily."""
+    mask_path = tmp_path / "mask.png"
+    noise = np.random.randint(0, 255, size=(400, 400, 4), dtype=np.uint8)
+    Image.fromarray(noise, mode="RGBA").save(mask_path)
+
+    url = map_widget._get_image_url(str(mask_path))
+
+    assert "mask.png?v=" in url
+    assert not (tmp_path / "mask.webp").exists()
@@ -0,0 +1,106 @@
+import pytest
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+from ui.pyqtgraph_map_widget import TiledRasterLoader, contrast_stretch
+
+
+def write_raster(path, data):
+    """Helper to write a CHW array as a GeoTIFF."""
+    with rasterio.open(
+        path, 'w', driver='GTiff',
+        height=data.shape[1], width=data.shape[2], count=data.shape[0],
+        dtype=data.dtype, transform=from_origin(0, 0, 1, 1)
+    ) as dst:
+        dst.write(data)
+
+
+@pytest.fixture
+def open_loader(tmp_path):
+    """Write a CHW array as a GeoTIFF and open a TiledRasterLoader on it.
+
+    Yields a factory; every loader it opens is closed on teardown, even when
+    the test fails.
+    """
+    loaders = []
+
+    def _open(data):
+        path = tmp_path / f"raster{len(loaders)}.tif"
+        write_raster(path, data)
+        loader = TiledRasterLoader(str(path))
+        loaders.append(loader)
+        assert loader.open()
+        return loader
+
+    yield _open
+    for loader in loaders:
+        loader.close()
+
+
+def reference_stretch(data, vmin, vmax):
+    """Helper with the straightforward float stretch contrast_stretch must match."""
+    scaled = (data.astype(np.float64) - vmin) * (255.0 / (vmax - vmin))
+    return np.clip(scaled, 0, 255)
+
+
+@pytest.mark.parametrize("dtype", [np.uint16, np.float32])
+def test_get_percentiles_matches_numpy(open_loader, dtype):
+    """Test that histogram-based percentiles approximate np.percentile."""
+    loader = open_loader(np.random.uniform(0, 1000, size=(3, 64, 64)).astype(dtype))
+
+    vmin, vmax = loader.get_percentiles(2, 98)
+    exact_min, exact_max = np.percentile(loader.get_overview(), [2, 98])
+    # uint16 counts every value exactly; floats use 1024 bins of ~1 unit
+    assert abs(vmin - exact_min) <= 2
+    assert abs(vmax - exact_max) <= 2
+    loader.close()
+    assert loader.get_percentiles(2, 98) is None
+
+
+def test_get_percentiles_samples_every_band(open_loader):
+    """Test that subsampling a large overview keeps pixels from all bands."""
+    data = np.empty((3, 128, 128), dtype=np.uint16)
+    data[0] = np.random.randint(0, 100, size=(128, 128))
+    data[1] = np.random.randint(5000, 10000, size=(128, 128))
+    data[2] = np.random.randint(10000, 20000, size=(128, 128))
+    loader = open_loader(data)
+    # 3 * 128 * 128 elements with max_samples=4096 gives a stride of 12
+    loader._build_histogram(max_samples=4096)
+
+    vmin, vmax = loader.get_percentiles(2, 98)
+    assert vmin < 100
+    assert vmax > 15000
+
+
+@pytest.mark.parametrize("dtype, high", [(np.uint8, 255), (np.uint16, 4000)])
+def test_contrast_stretch_integer_lut(open_loader, dtype, high):
+    """Test that the lookup-table path matches a plain float stretch."""
+    loader = open_loader(np.random.randint(0, high, size=(3, 64, 64)).astype(dtype))
+
+    stretched = contrast_stretch(loader, 2, 98)
+    vmin, vmax = loader.stretch_limits
+    expected = reference_stretch(loader.get_overview(), vmin, vmax)
+    assert stretched.dtype == np.uint8
+    assert np.abs(stretched - expected).max() <= 1
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_contrast_stretch_float(open_loader, dtype):
+    """Test that the OpenCV path stretches and saturates float rasters."""
+    loader = open_loader(np.random.uniform(-1.0, 1.0, size=(3, 64, 64)).astype(dtype))
+
+    stretched = contrast_stretch(loader, 2, 98)
+    vmin, vmax = loader.stretch_limits
+    expected = reference_stretch(loader.get_overview(), vmin, vmax)
+    assert stretched.dtype == np.uint8
+    assert np.abs(stretched - expected).max() <= 1
+    assert stretched.min() == 0 and stretched.max() == 255
+
+
+def test_contrast_stretch_reuses_output_buffer(open_loader):
+    """Test that restretching rewrites the same buffer and flat data passes through."""
+    loader = open_loader(np.full((3, 32, 32), 7, dtype=np.uint8))
+
+    flat = contrast_stretch(loader, 2, 98)
+    assert np.all(flat == 7)
+    assert contrast_stretch(loader, 10, 90) is flat
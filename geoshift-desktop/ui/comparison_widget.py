@@ -3,12 +3,12 @@ Side-by-side comparison widget for PyQtGraph.
 Displays two rasters with synchronized pan/zoom and an interactive slider.
 """
 
-import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 import pyqtgraph as pg
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QSplitter, 
                              QLabel, QSlider, QPushButton)
-from PyQt5.QtCore import Qt, pyqtSignal
-from ui.pyqtgraph_map_widget import TiledRasterLoader
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
+from ui.pyqtgraph_map_widget import TiledRasterLoader, contrast_stretch
 from engine.logger import logger
 
 
@@ -55,6 +55,12 @@ class ComparisonWidget(QWidget):
         layout.setContentsMargins(0, 0, 0, 0)
         layout.setSpacing(0)
         
+        # Restretch at most once per 30 ms while a contrast slider is dragged
+        self._contrast_timer = QTimer(self)
+        self._contrast_timer.setSingleShot(True)
+        self._contrast_timer.setInterval(30)
+        self._contrast_timer.timeout.connect(self.update_contrast)
+        
         # Top controls
         controls_layout = QHBoxLayout()
         controls_layout.setContentsMargins(10, 5, 10, 5)
@@ -129,14 +135,14 @@ class ComparisonWidget(QWidget):
         self.contrast_min = QSlider(Qt.Horizontal)
         self.contrast_min.setRange(0, 100)
         self.contrast_min.setValue(2)
-        self.contrast_min.valueChanged.connect(self.update_contrast)
+        self.contrast_min.valueChanged.connect(lambda _: self._contrast_timer.start())
         bottom_controls.addWidget(QLabel("Min:"))
         bottom_controls.addWidget(self.contrast_min)
         
         self.contrast_max = QSlider(Qt.Horizontal)
         self.contrast_max.setRange(0, 100)
         self.contrast_max.setValue(98)
-        self.contrast_max.valueChanged.connect(self.update_contrast)
+        self.contrast_max.valueChanged.connect(lambda _: self._contrast_timer.start())
         bottom_controls.addWidget(QLabel("Max:"))
         bottom_controls.addWidget(self.contrast_max)
         
@@ -169,15 +175,17 @@ class ComparisonWidget(QWidget):
             if self.loader_b:
                 self.loader_b.close()
             
-            # Load raster A
+            # Load both rasters concurrently; rasterio releases the GIL while
+            # decoding, so the two overview reads overlap
             self.loader_a = TiledRasterLoader(raster_a['path'])
-            if not self.loader_a.open():
+            self.loader_b = TiledRasterLoader(raster_b['path'])
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                opened_a, opened_b = pool.map(TiledRasterLoader.open, (self.loader_a, self.loader_b))
+            
+            if not opened_a:
                 logger.error("Failed to open raster A")
                 return
-            
-            # Load raster B
-            self.loader_b = TiledRasterLoader(raster_b['path'])
-            if not self.loader_b.open():
+            if not opened_b:
                 logger.error("Failed to open raster B")
                 return
             
@@ -190,12 +198,12 @@ class ComparisonWidget(QWidget):
                 return
             
             # Apply contrast stretch
-            stretched_a = self.apply_contrast_stretch(overview_a)
-            stretched_b = self.apply_contrast_stretch(overview_b)
+            stretched_a = self.apply_contrast_stretch(self.loader_a)
+            stretched_b = self.apply_contrast_stretch(self.loader_b)
             
             # Display
-            self.view_a.setImage(stretched_a, autoRange=True, autoLevels=False)
-            self.view_b.setImage(stretched_b, autoRange=True, autoLevels=False)
+            self.view_a.setImage(stretched_a, autoRange=True, autoLevels=False, levels=(0, 255))
+            self.view_b.setImage(stretched_b, autoRange=True, autoLevels=False, levels=(0, 255))
             
             # Update labels
             self.label_a.setText(f"Image A: {raster_a.get('name', 'Unknown')}")
@@ -204,38 +212,32 @@ class ComparisonWidget(QWidget):
             logger.info("Comparison view loaded successfully")
             
         except Exception as e:
-            logger.error(f"Error in comparison view: {e}")
+            logger.error("Error in comparison view: %s", e)
     
-    def apply_contrast_stretch(self, data):
-        """Apply contrast stretching to image data."""
-        if data is None or data.size == 0:
-            return data
-        
-        min_pct = self.contrast_min.value()
-        max_pct = self.contrast_max.value()
-        
-        vmin = np.percentile(data, min_pct)
-        vmax = np.percentile(data, max_pct)
-        
-        stretched = np.clip(data, vmin, vmax)
-        if vmax > vmin:
-            stretched = ((stretched - vmin) / (vmax - vmin) * 255).astype(np.uint8)
-        else:
-            stretched = data.astype(np.uint8)
-        
-        return stretched
+    def apply_contrast_stretch(self, loader):
+        """Apply contrast stretching to a loader's overview."""
+        return contrast_stretch(loader, self.contrast_min.value(), self.contrast_max.value())
     
     def update_contrast(self):
         """Update contrast for both images."""
-        if self.loader_a and self.loader_a.overview_data is not None:
-            overview_a = self.loader_a.get_overview()
-            stretched_a = self.apply_contrast_stretch(overview_a)
-            self.view_a.setImage(stretched_a, autoRange=False, autoLevels=False)
+        pcts = (self.contrast_min.value(), self.contrast_max.value())
+        if (self.loader_a and self.loader_a.overview_data is not None
+                and not self.loader_a.stretch_is_current(*pcts)):
+            self._show_stretched(self.view_a, self.apply_contrast_stretch(self.loader_a))
         
-        if self.loader_b and self.loader_b.overview_data is not None:
-            overview_b = self.loader_b.get_overview()
-            stretched_b = self.apply_contrast_stretch(overview_b)
-            self.view_b.setImage(stretched_b, autoRange=False, autoLevels=False)
+        if (self.loader_b and self.loader_b.overview_data is not None
+                and not self.loader_b.stretch_is_current(*pcts)):
+            self._show_stretched(self.view_b, self.apply_contrast_stretch(self.loader_b))
+    
+    @staticmethod
+    def _show_stretched(view, stretched):
+        """Repaint a view whose stretch buffer was rewritten in place, else set the new image."""
+        if stretched is view.image:
+            view.imageItem.updateImage()
+            # Only a new array emits this; the histogram must see the new values
+            view.imageItem.sigImageChanged.emit()
+        else:
+            view.setImage(stretched, autoRange=False, autoLevels=False, levels=(0, 255))
     
     def on_view_a_changed(self, range_data):
         """Sync view B when view A changes."""
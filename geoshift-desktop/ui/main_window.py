@@ -1,11 +1,14 @@
 import os
+import hashlib
+import tempfile
 from PyQt5.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, 
     QLabel, QFrame, QSplitter, QTableWidget, QTableWidgetItem, 
     QHeaderView, QMessageBox, QFileDialog, QComboBox
 )
-from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from PyQt5.QtCore import Qt, QThread, QTimer, pyqtSignal
 from PyQt5.QtGui import QIcon
+from engine.logger import logger
 
 # FEATURE FLAG: Toggle between Folium and PyQtGraph
 # Set to True to use new PyQtGraph widget (requires: pip install pyqtgraph PyOpenGL)
@@ -29,10 +32,9 @@ from ui.layer_panel import LayerPanel
 from ui.dialogs.open_file_dialog import open_file_dialog
 from engine.reader import load_raster
 from engine.analysis_change import run_detection
-from engine.change_tools import calculate_change_area, generate_change_map
+from engine.change_tools import calculate_change_area, generate_change_map, change_map_to_rgba, pack_mask, downscale_mask
 from engine.exporter import export_report
 from engine.models_manager import get_models_manager
-from engine.logger import logger
 from app import AppState
 import numpy as np
 from PIL import Image
@@ -58,6 +60,92 @@ class RasterLoader(QThread):
         except Exception as e:
             self.error.emit(str(e))
 
+class AnalysisWorker(QThread):
+    """Thread for running change detection without blocking UI."""
+    finished = pyqtSignal(object, object, object, str)  # packed change mask, mask shape, stats, overlay path
+    error = pyqtSignal(str)
+    progress = pyqtSignal(str)
+    
+    def __init__(self, path_a, path_b, analysis_type, overlay_max_size=2048):
+        super().__init__()
+        self.path_a = path_a
+        self.path_b = path_b
+        self.analysis_type = analysis_type
+        self.overlay_max_size = overlay_max_size
+        self.mask_path = None  # Overlay PNG written by run(), once known
+    
+    def run(self):
+        try:
+            img_a = self.read_bands(self.path_a)
+            img_b = self.read_bands(self.path_b)
+            
+            # Ensure images are 3-channel for OpenCV processing
+            if img_a.ndim == 2:
+                img_a = cv2.cvtColor(img_a, cv2.COLOR_GRAY2RGB)
+            elif img_a.shape[2] == 1:
+                img_a = cv2.cvtColor(img_a, cv2.COLOR_GRAY2RGB)
+            if img_b.ndim == 2:
+                img_b = cv2.cvtColor(img_b, cv2.COLOR_GRAY2RGB)
+            elif img_b.shape[2] == 1:
+                img_b = cv2.cvtColor(img_b, cv2.COLOR_GRAY2RGB)
+            
+            # Ensure both images have the same dimensions
+            if img_a.shape[:2] != img_b.shape[:2]:
+                self.progress.emit("Resizing images to match dimensions...")
+                # Resize to the smaller dimensions to preserve quality
+                target_height = min(img_a.shape[0], img_b.shape[0])
+                target_width = min(img_a.shape[1], img_b.shape[1])
+                
+                if img_a.shape[:2] != (target_height, target_width):
+                    img_a = cv2.resize(img_a, (target_width, target_height), interpolation=cv2.INTER_AREA)
+                    self.progress.emit(f"Resized Image A to {target_width}x{target_height}")
+                
+                if img_b.shape[:2] != (target_height, target_width):
+                    img_b = cv2.resize(img_b, (target_width, target_height), interpolation=cv2.INTER_AREA)
+                    self.progress.emit(f"Resized Image B to {target_width}x{target_height}")
+            
+            # Run detection
+            change_mask, stats = run_detection(img_a, img_b, self.analysis_type)
+            
+            # The overlay is only displayed over the preview, so cap its resolution
+            overlay_mask = downscale_mask(change_mask, self.overlay_max_size)
+            
+            # Name the overlay after its content so an identical re-run reuses the
+            # existing file and the web view can cache each version as immutable
+            digest = hashlib.blake2b(overlay_mask.tobytes(), digest_size=8)
+            digest.update(str(overlay_mask.shape).encode())
+            mask_path = os.path.join(tempfile.gettempdir(), f"change_mask_{digest.hexdigest()}.png")
+            self.mask_path = mask_path
+            
+            if not os.path.exists(mask_path):
+                # Save change mask as a semi-transparent colored overlay
+                change_rgba = change_map_to_rgba(generate_change_map(overlay_mask, overlay_mask))
+                
+                # Transient overlay read back by the map widget: favour encode speed over size.
+                # Written under a temporary name and moved into place, so an
+                # interrupted save never leaves a truncated file the check above reuses
+                fd, tmp_path = tempfile.mkstemp(prefix="change_mask_", suffix=".tmp")
+                os.close(fd)
+                try:
+                    Image.fromarray(change_rgba).save(tmp_path, 'PNG', optimize=False, compress_level=1)
+                    os.replace(tmp_path, mask_path)
+                except Exception:
+                    os.remove(tmp_path)
+                    raise
+            
+            # Keep the full-resolution mask at 1 bit per pixel in AppState
+            self.finished.emit(pack_mask(change_mask), change_mask.shape, stats, mask_path)
+        except Exception as e:
+            self.error.emit(str(e))
+    
+    @staticmethod
+    def read_bands(path, max_bands=3):
+        """Read only the first bands detection uses, in HWC format for OpenCV."""
+        with rasterio.open(path) as src:
+            indexes = list(range(1, min(src.count, max_bands) + 1))
+            img = src.read(indexes)
+        return np.transpose(img, (1, 2, 0))
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -71,6 +159,16 @@ class MainWindow(QMainWindow):
         
         self.state = AppState()
         self.models_manager = get_models_manager()
+        self.analysis_worker = None  # Pending AnalysisWorker, if any
+        self.analysis_generation = 0  # Bumped on clear; results of older workers are dropped
+        self.mask_paths = set()  # Overlay PNGs written by analyses, removed on clear/close
+        self.meta_parts = {}  # slot -> compact metadata text shown in the status bar
+        
+        # Coalesce bursts of refresh requests (loads, toggles, swaps) into one render
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setSingleShot(True)
+        self.refresh_timer.setInterval(50)
+        self.refresh_timer.timeout.connect(self.refresh_comparison)
         
         # Main Layout
         central_widget = QWidget()
@@ -152,9 +250,7 @@ class MainWindow(QMainWindow):
         self.btn_export.clicked.connect(self.export_report)
         
         # Symbology signals
-        self.symbology_panel.opacity_changed.connect(self.on_opacity_changed)
-        self.symbology_panel.brightness_changed.connect(self.on_brightness_changed)
-        self.symbology_panel.contrast_changed.connect(self.on_contrast_changed)
+        self.symbology_panel.params_changed.connect(self.on_symbology_changed)
         
         # Layer Panel signals
         self.layer_panel.visibility_changed.connect(self.map_widget.toggle_layer_visibility)
@@ -389,11 +485,11 @@ class MainWindow(QMainWindow):
 
     def update_ui_state(self):
         has_both = self.state.has_both_images()
-        self.btn_analyze.setEnabled(has_both)
+        self.btn_analyze.setEnabled(has_both and self.analysis_worker is None)
         self.btn_toggle_change.setEnabled(self.state.change_mask is not None)
         self.btn_export.setEnabled(self.state.change_results is not None)
 
-    def update_metadata(self, data, slot):
+    def update_metadata(self, data, slot, render=True):
         """Update compact metadata label."""
         if not data:
             return
@@ -402,13 +498,13 @@ class MainWindow(QMainWindow):
         dims = f"{data['width']}x{data['height']}"
         crs = str(data['crs'])
         
-        current_text = self.meta_label.text()
-        new_info = f"Img {slot}: {filename} ({dims}, {crs})"
-        
-        if current_text:
-            self.meta_label.setText(f"{current_text}  |  {new_info}")
-        else:
-            self.meta_label.setText(new_info)
+        self.meta_parts[slot] = f"Img {slot}: {filename} ({dims}, {crs})"
+        if render:
+            self.render_metadata()
+
+    def render_metadata(self):
+        """Set the metadata label text once from the per-slot entries."""
+        self.meta_label.setText("  |  ".join(self.meta_parts[slot] for slot in sorted(self.meta_parts)))
 
     def load_image(self, slot):
         logger.info(f"load_image called for slot {slot}")
@@ -446,17 +542,17 @@ class MainWindow(QMainWindow):
         
         # Show comparison if both loaded
         if self.state.has_both_images():
-            self.refresh_comparison()
+            self.schedule_refresh()
             self.log("Both images loaded. Select analysis type and click 'Run Analysis'.")
             # Show comparison mode indicator
             self.comparison_indicator.show()
         else:
             # Show single image
             self.map_widget.show_map(data)
+            self.layer_panel.refresh()
             # Hide comparison indicator
             self.comparison_indicator.hide()
-        
-        self.layer_panel.refresh()
+
         self.update_ui_state()
     
     def on_raster_error(self, error, slot):
@@ -473,8 +569,13 @@ class MainWindow(QMainWindow):
         self.state.selected_analysis_type = self.analysis_combo.itemData(index)
         self.log(f"Analysis type: {self.analysis_combo.currentText()}")
     
+    def schedule_refresh(self):
+        """Refresh the comparison view once the current burst of changes settles."""
+        self.refresh_timer.start()
+    
     def refresh_comparison(self):
         """Refresh the comparison view."""
+        self.refresh_timer.stop()
         if self.using_pyqtgraph:
             # PyQtGraph comparison mode
             self.map_widget.hide()
@@ -485,7 +586,7 @@ class MainWindow(QMainWindow):
             )
         else:
             # Folium comparison mode
-            change_mask_path = "change_mask.png" if self.state.change_mask is not None and self.state.change_visible else None
+            change_mask_path = self.state.change_mask_path if self.state.change_mask is not None and self.state.change_visible else None
             self.map_widget.show_comparison(
                 self.state.raster_a, 
                 self.state.raster_b,
@@ -499,94 +600,72 @@ class MainWindow(QMainWindow):
         if not self.state.has_both_images():
             logger.warning("Cannot run analysis: missing images")
             return
+        if self.analysis_worker is not None:
+            logger.warning("Cannot run analysis: previous analysis still running")
+            return
         
         analysis_type = self.state.selected_analysis_type
         logger.info(f"Starting analysis: {analysis_type}")
         self.log(f"Running {self.analysis_combo.currentText()}...")
-        self.btn_analyze.setEnabled(False)
         
-        try:
-            # Read full images
-            with rasterio.open(self.state.raster_a['path']) as src_a:
-                img_a = src_a.read()
-                # Convert to HWC format for OpenCV
-                if img_a.shape[0] <= 4:  # CHW format
-                    img_a = np.transpose(img_a, (1, 2, 0))
-                if img_a.shape[2] > 3:
-                    img_a = img_a[:, :, :3]  # Take first 3 bands
-            
-            with rasterio.open(self.state.raster_b['path']) as src_b:
-                img_b = src_b.read()
-                if img_b.shape[0] <= 4:
-                    img_b = np.transpose(img_b, (1, 2, 0))
-                if img_b.shape[2] > 3:
-                    img_b = img_b[:, :, :3]
-            
-            # Ensure images are 3-channel for OpenCV processing
-            if img_a.ndim == 2:
-                img_a = cv2.cvtColor(img_a, cv2.COLOR_GRAY2RGB)
-            elif img_a.shape[2] == 1:
-                img_a = cv2.cvtColor(img_a, cv2.COLOR_GRAY2RGB)
-            if img_b.ndim == 2:
-                img_b = cv2.cvtColor(img_b, cv2.COLOR_GRAY2RGB)
-            elif img_b.shape[2] == 1:
-                img_b = cv2.cvtColor(img_b, cv2.COLOR_GRAY2RGB)
-            
-            # Ensure both images have the same dimensions
-            if img_a.shape[:2] != img_b.shape[:2]:
-                self.log(f"Resizing images to match dimensions...")
-                # Resize to the smaller dimensions to preserve quality
-                target_height = min(img_a.shape[0], img_b.shape[0])
-                target_width = min(img_a.shape[1], img_b.shape[1])
-                
-                if img_a.shape[:2] != (target_height, target_width):
-                    img_a = cv2.resize(img_a, (target_width, target_height), interpolation=cv2.INTER_AREA)
-                    self.log(f"Resized Image A to {target_width}x{target_height}")
-                
-                if img_b.shape[:2] != (target_height, target_width):
-                    img_b = cv2.resize(img_b, (target_width, target_height), interpolation=cv2.INTER_AREA)
-                    self.log(f"Resized Image B to {target_width}x{target_height}")
-            
-            # Run detection
-            change_mask, stats = run_detection(img_a, img_b, analysis_type)
-            
-            self.state.change_mask = change_mask
-            self.state.change_results = stats
-            
-            # Save change mask as colored overlay
-            change_colored = generate_change_map(change_mask, change_mask)
-            change_img = Image.fromarray(change_colored, mode='RGB')
-            
-            # Make semi-transparent
-            change_rgba = Image.new("RGBA", change_img.size)
-            change_rgba.paste(change_img)
-            
-            # Apply transparency where no change
-            pixels = change_rgba.load()
-            for i in range(change_rgba.size[0]):
-                for j in range(change_rgba.size[1]):
-                    if pixels[i, j][:3] == (0, 0, 0):  # No change
-                        pixels[i, j] = (0, 0, 0, 0)
-                    else:
-                        pixels[i, j] = (*pixels[i, j][:3], 180)
-            
-            change_rgba.save("change_mask.png")
-            
-            self.refresh_comparison()
-            
-            change_pct = stats.get('change_percentage', 0)
-            self.log(f"Analysis complete. Change detected: {change_pct:.2f}% of image area.")
-            
-        except Exception as e:
-            self.log(f"Analysis error: {e}")
-        finally:
-            self.btn_analyze.setEnabled(True)
+        worker = AnalysisWorker(
+            self.state.raster_a['path'],
+            self.state.raster_b['path'],
+            analysis_type
+        )
+        worker.generation = self.analysis_generation
+        worker.progress.connect(self.log)
+        worker.finished.connect(self.on_analysis_done)
+        worker.error.connect(self.on_analysis_error)
+        worker.start()
+        self.analysis_worker = worker
+        self.update_ui_state()
+    
+    def _release_analysis_worker(self):
+        """Wait for the worker thread to return from run() and drop it.
+        
+        Returns:
+            True if the worker was started before the last clear, so its
+            result no longer applies
+        """
+        worker = self.analysis_worker
+        worker.wait()
+        self.analysis_worker = None
+        return worker.generation != self.analysis_generation
+    
+    def on_analysis_done(self, packed_mask, mask_shape, stats, mask_path):
+        """Callback when change detection completes."""
+        stale = self._release_analysis_worker()
+        self.mask_paths.add(mask_path)
+        if stale:
+            # The layers were cleared while it ran, so every tracked overlay
+            # (just this one, as analyses never overlap) is obsolete
+            self._remove_change_masks()
+            logger.info("Discarded analysis result from before the last clear")
             self.update_ui_state()
+            return
+        self.state.set_change_mask(packed_mask, mask_shape)
+        self.state.change_mask_path = mask_path
+        self.state.change_results = stats
+        
+        self.schedule_refresh()
+        
+        change_pct = stats.get('change_percentage', 0)
+        self.log(f"Analysis complete. Change detected: {change_pct:.2f}% of image area.")
+        self.update_ui_state()
+    
+    def on_analysis_error(self, error):
+        """Callback when change detection fails."""
+        if self._release_analysis_worker():
+            logger.info(f"Discarded analysis error from before the last clear: {error}")
+        else:
+            self.log(f"Analysis error: {error}")
+        self.update_ui_state()
 
     def toggle_change(self):
         if self.state.change_mask is not None:
             self.state.change_visible = not self.state.change_visible
-            self.refresh_comparison()
+            self.schedule_refresh()
 
     def export_report(self):
         if self.state.change_results:
@@ -606,16 +685,21 @@ class MainWindow(QMainWindow):
                 else:
                     QMessageBox.critical(self, "Error", "Failed to export report.")
     
+    def on_symbology_changed(self, params):
+        """Apply a batch of symbology changes from the symbology panel."""
+        if 'opacity' in params:
+            self.on_opacity_changed(params['opacity'])
+        if 'brightness' in params:
+            self.on_brightness_changed(params['brightness'])
+        if 'contrast' in params:
+            self.on_contrast_changed(params['contrast'])
+    
     def on_opacity_changed(self, value):
         """Handle opacity adjustment from symbology panel."""
         # Update currently selected layer if any
         if hasattr(self, 'selected_layer') and self.selected_layer:
-            # We need to update the layer in map_widget
-            # But map_widget.layers stores info. We need a method to update opacity.
-            # For now, let's just re-add the layer with new opacity or update the dict and re-render
             if self.selected_layer in self.map_widget.layers:
-                self.map_widget.layers[self.selected_layer]['opacity'] = value
-                self.map_widget._render_map()
+                self.map_widget.set_layer_opacity(self.selected_layer, value)
     
     def on_brightness_changed(self, value):
         """Handle brightness adjustment from symbology panel."""
@@ -638,20 +722,48 @@ class MainWindow(QMainWindow):
         """Swap Image A and Image B."""
         if self.state.has_both_images():
             self.state.raster_a, self.state.raster_b = self.state.raster_b, self.state.raster_a
-            self.refresh_comparison()
+            self.schedule_refresh()
             self.log("Swapped Image A and Image B")
-            # Clear and rebuild metadata labels to avoid duplication
-            self.meta_label.setText("")
-            self.update_metadata(self.state.raster_a, 'A')
-            self.update_metadata(self.state.raster_b, 'B')
+            self.update_metadata(self.state.raster_a, 'A', render=False)
+            self.update_metadata(self.state.raster_b, 'B', render=False)
+            self.render_metadata()
 
     def clear_all_layers(self):
+        self.refresh_timer.stop()
         self.map_widget.clear_all_layers()
         self.layer_panel.refresh()
         self.state.raster_a = None
         self.state.raster_b = None
         self.btn_load_a.setEnabled(True)
         self.btn_load_b.setEnabled(True)
-        self.meta_label.setText("")
+        self.meta_parts.clear()
+        self.render_metadata()
         self.comparison_indicator.hide()  # Hide indicator when clearing
+        # Results belong to the cleared images, and so do their overlay files;
+        # a still-running analysis is for them too and is ignored when it ends
+        self.analysis_generation += 1
+        self.state.clear_analysis()
+        self._remove_change_masks()
+        self.update_ui_state()
         self.log("Cleared all layers")
+    
+    def _remove_change_masks(self):
+        """Delete the overlay PNGs written by this session's analyses."""
+        for path in self.mask_paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self.mask_paths.clear()
+
+    def closeEvent(self, event):
+        # Child widgets only get closeEvent when closed explicitly; the map
+        # widget uses it to remove its temporary page file
+        self.map_widget.close()
+        if self.analysis_worker is not None:
+            # Let a running analysis finish writing its overlay so it is removed too
+            self.analysis_worker.wait()
+            if self.analysis_worker.mask_path:
+                self.mask_paths.add(self.analysis_worker.mask_path)
+        self._remove_change_masks()
+        super().closeEvent(event)
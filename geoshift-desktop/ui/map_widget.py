@@ -1,13 +1,189 @@
-import io
+import hashlib
+import json
 import os
+import tempfile
+from collections import OrderedDict
 import folium
 from folium import plugins
+from branca.element import Template
+from PIL import Image, features
 from PyQt5.QtWidgets import QWidget, QVBoxLayout
-from PyQt5.QtWebEngineWidgets import QWebEngineView
-from PyQt5.QtCore import QUrl
-import base64
+from PyQt5.QtWebEngineWidgets import QWebEngineView, QWebEngineSettings
+from PyQt5.QtCore import QByteArray, QTimer, QUrl
 from engine.logger import logger
 
+# Large PNG overlays are transcoded once to lossy WebP (alpha stays lossless),
+# which is smaller on disk and faster for Chromium to decode
+_WEBP_MIN_BYTES = 256 * 1024
+_HAS_WEBP = features.check('webp')
+
+# The side-by-side plugin ships with the app; resolve its asset URLs once so
+# every comparison page links the same local files (cached by WebEngine)
+# instead of fetching them from the CDN
+_JS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "js")
+_SBS_JS_URL = QUrl.fromLocalFile(os.path.join(_JS_DIR, "leaflet-side-by-side.min.js")).toString()
+_SBS_CSS_URL = QUrl.fromLocalFile(os.path.join(_JS_DIR, "leaflet-side-by-side.css")).toString()
+
+
+def _leaflet_bounds(bounds):
+    """Convert a left/bottom/right/top box to Leaflet [[south, west], [north, east]]."""
+    return [[bounds.bottom, bounds.left], [bounds.top, bounds.right]]
+
+
+class _LocalSideBySideLayers(plugins.SideBySideLayers):
+    """SideBySideLayers that loads the bundled plugin instead of the CDN copy."""
+    default_js = [("leaflet.sidebyside", _SBS_JS_URL)]
+    default_css = [("leaflet.sidebyside.css", _SBS_CSS_URL)]
+
+    # Also expose both overlays and a setSide(slot, url, bounds) hook so a
+    # live page can swap one side without being regenerated
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = L.control.sideBySide(
+                {{ this.layer_left.get_name() }}, {{ this.layer_right.get_name() }}
+            ).addTo({{ this._parent.get_name() }});
+            window.__imgA = {{ this.layer_left.get_name() }};
+            window.__imgB = {{ this.layer_right.get_name() }};
+            window.setSide = function(slot, url, bounds) {
+                var layer = slot == 'A' ? window.__imgA : window.__imgB;
+                layer.setUrl(url);
+                if (bounds) { layer.setBounds(L.latLngBounds(bounds)); }
+            };
+        {% endmacro %}
+    """)
+
+
+# Inject Polyfill for ImageOverlay.getContainer (required for SideBySide plugin with newer Leaflet)
+_POLYFILL = """
+<script>
+    L.ImageOverlay.prototype.getContainer = function() { return this.getElement(); };
+</script>
+"""
+
+# Add custom CSS to make the slider more visible
+_SLIDER_CSS = """
+<style>
+    /* Make the comparison slider more visible */
+    .leaflet-sbs-divider {
+        background-color: white !important;
+        width: 4px !important;
+        box-shadow: 0 0 10px rgba(0,0,0,0.5) !important;
+        cursor: ew-resize !important;
+    }
+    .leaflet-sbs-range {
+        position: absolute;
+        top: 50%;
+        width: 100%;
+        z-index: 999;
+    }
+    /* Add a handle/grip to the slider */
+    .leaflet-sbs-divider:before {
+        content: '⬌';
+        position: absolute;
+        top: 50%;
+        left: 50%;
+        transform: translate(-50%, -50%);
+        background: white;
+        padding: 10px;
+        border-radius: 50%;
+        box-shadow: 0 2px 8px rgba(0,0,0,0.3);
+        font-size: 20px;
+        color: #3498db;
+    }
+</style>
+"""
+
+# Static page additions, assembled once rather than per render
+_PAGE_EXTRAS = _POLYFILL + _SLIDER_CSS
+
+
+# Waiting page shown before any image is loaded; encoded once for setContent
+_BLANK_PAGE = """
+<!DOCTYPE html>
+<html>
+<head>
+    <style>
+        body {
+            margin: 0;
+            padding: 0;
+            display: flex;
+            justify-content: center;
+            align-items: center;
+            height: 100vh;
+            background: linear-gradient(135deg, #f5f7fa 0%, #c3cfe2 100%);
+            font-family: 'Segoe UI', Arial, sans-serif;
+            color: #2c3e50;
+        }
+        .container {
+            text-align: center;
+            background: white;
+            padding: 40px;
+            border-radius: 12px;
+            box-shadow: 0 10px 25px rgba(0,0,0,0.1);
+            border: 2px dashed #bdc3c7;
+            max-width: 400px;
+            width: 100%;
+        }
+        .icon {
+            font-size: 48px;
+            color: #3498db;
+            margin-bottom: 20px;
+        }
+        h1 {
+            font-size: 24px;
+            margin: 0 0 10px 0;
+            color: #2c3e50;
+        }
+        p {
+            font-size: 14px;
+            color: #7f8c8d;
+            margin: 0;
+            line-height: 1.5;
+        }
+        .steps {
+            margin-top: 20px;
+            text-align: left;
+            background: #f8f9fa;
+            padding: 15px;
+            border-radius: 8px;
+        }
+        .step {
+            display: flex;
+            align-items: center;
+            margin-bottom: 8px;
+            font-size: 13px;
+        }
+        .step-num {
+            background: #3498db;
+            color: white;
+            width: 20px;
+            height: 20px;
+            border-radius: 50%;
+            display: flex;
+            align-items: center;
+            justify-content: center;
+            font-size: 11px;
+            margin-right: 10px;
+            flex-shrink: 0;
+        }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="icon">🗺️</div>
+        <h1>Start Analysis</h1>
+        <p>Load your before and after images to begin change detection.</p>
+        <div class="steps">
+            <div class="step"><div class="step-num">1</div><div>Load <b>Image A</b> (Before)</div></div>
+            <div class="step"><div class="step-num">2</div><div>Load <b>Image B</b> (After)</div></div>
+            <div class="step"><div class="step-num">3</div><div>Select <b>Analysis Type</b></div></div>
+        </div>
+    </div>
+</body>
+</html>
+"""
+_BLANK_HTML = QByteArray(_BLANK_PAGE.encode("utf-8"))
+
 
 class MapWidget(QWidget):
     def __init__(self, parent=None):
@@ -16,6 +192,7 @@ class MapWidget(QWidget):
         self.layout.setContentsMargins(0, 0, 0, 0)
 
         self.web_view = QWebEngineView()
+        self.web_view.settings().setAttribute(QWebEngineSettings.LocalContentCanAccessFileUrls, True)
         self.layout.addWidget(self.web_view)
 
         # Initialize layer storage and map defaults
@@ -24,111 +201,107 @@ class MapWidget(QWidget):
         self.base_zoom = 2
         self.comparison_mode = False  # If True, enables SideBySide slider
 
+        # Rendered HTML keyed by layer signature, so flipping back to a
+        # previously shown state (e.g. mask toggle) skips Folium entirely
+        self._html_cache = OrderedDict()
+        self._html_cache_size = 4
+        # path -> ((mtime_ns, size), file URL) for overlay images
+        self._url_cache = {}
+        # What the live page holds, so later edits can be applied in place via
+        # runJavaScript: whether it has a side-by-side slider (see update_side),
+        # the Leaflet map variable, and layer name -> overlay variables (image, mask)
+        self._slider_live = False
+        self._js_map = None
+        self._js_layers = {}
+        # Render signature of what the live page shows; re-rendering it is a no-op
+        self._live_sig = None
+
+        # _render_map requests are coalesced so a burst of layer edits in one
+        # event-loop turn produces a single page build
+        self._render_timer = QTimer(self)
+        self._render_timer.setSingleShot(True)
+        self._render_timer.setInterval(0)
+        self._render_timer.timeout.connect(self._render_map_now)
+
+        # Map pages are loaded from a local file rather than setHtml, which avoids
+        # its 2 MB limit and lets overlays reference preview files via file:// URLs
+        with tempfile.NamedTemporaryFile(prefix="geoshift_map_", suffix=".html", delete=False) as tmp:
+            self._html_path = tmp.name
+
         # Default: blank screen
         self._show_blank_screen()
 
     def _show_blank_screen(self):
         """Display a blank white screen with a waiting message."""
-        html = """
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body {
-                    margin: 0;
-                    padding: 0;
-                    display: flex;
-                    justify-content: center;
-                    align-items: center;
-                    height: 100vh;
-                    background: linear-gradient(135deg, #f5f7fa 0%, #c3cfe2 100%);
-                    font-family: 'Segoe UI', Arial, sans-serif;
-                    color: #2c3e50;
-                }
-                .container {
-                    text-align: center;
-                    background: white;
-                    padding: 40px;
-                    border-radius: 12px;
-                    box-shadow: 0 10px 25px rgba(0,0,0,0.1);
-                    border: 2px dashed #bdc3c7;
-                    max-width: 400px;
-                    width: 100%;
-                }
-                .icon {
-                    font-size: 48px;
-                    color: #3498db;
-                    margin-bottom: 20px;
-                }
-                h1 {
-                    font-size: 24px;
-                    margin: 0 0 10px 0;
-                    color: #2c3e50;
-                }
-                p {
-                    font-size: 14px;
-                    color: #7f8c8d;
-                    margin: 0;
-                    line-height: 1.5;
-                }
-                .steps {
-                    margin-top: 20px;
-                    text-align: left;
-                    background: #f8f9fa;
-                    padding: 15px;
-                    border-radius: 8px;
-                }
-                .step {
-                    display: flex;
-                    align-items: center;
-                    margin-bottom: 8px;
-                    font-size: 13px;
-                }
-                .step-num {
-                    background: #3498db;
-                    color: white;
-                    width: 20px;
-                    height: 20px;
-                    border-radius: 50%;
-                    display: flex;
-                    align-items: center;
-                    justify-content: center;
-                    font-size: 11px;
-                    margin-right: 10px;
-                    flex-shrink: 0;
-                }
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="icon">🗺️</div>
-                <h1>Start Analysis</h1>
-                <p>Load your before and after images to begin change detection.</p>
-                <div class="steps">
-                    <div class="step"><div class="step-num">1</div><div>Load <b>Image A</b> (Before)</div></div>
-                    <div class="step"><div class="step-num">2</div><div>Load <b>Image B</b> (After)</div></div>
-                    <div class="step"><div class="step-num">3</div><div>Select <b>Analysis Type</b></div></div>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        self.web_view.setHtml(html)
+        self._render_timer.stop()
+        self.web_view.setContent(_BLANK_HTML, "text/html;charset=UTF-8")
+        self._slider_live, self._js_map, self._js_layers = False, None, {}
+        self._live_sig = None
         logger.info("Map widget initialized with blank screen")
 
-    def _get_image_url(self, path):
-        """Convert local file path to base64 data URI."""
-        if not path or not os.path.exists(path):
+    def _get_image_url(self, path, lossy=False):
+        """Convert local file path to a file:// URL the web view loads from disk.
+
+        The URL carries the file's mtime as a version so a rewritten preview
+        (same name, new content) is not served from WebEngine's cache.
+        Only pass lossy=True for imagery previews: large PNGs are then served
+        as lossy WebP, which would smear the class colours of mask overlays.
+        """
+        try:
+            st = os.stat(path) if path else None
+        except OSError:
+            st = None
+        if st is None:
             logger.warning(f"Image path does not exist: {path}")
             return ""
+        stamp = (st.st_mtime_ns, st.st_size)
+        cached = self._url_cache.get(path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        served = path
+        if lossy and _HAS_WEBP and st.st_size > _WEBP_MIN_BYTES and path.lower().endswith('.png'):
+            served = self._to_webp(path, st)
+        url = QUrl.fromLocalFile(os.path.abspath(served))
+        url.setQuery(f"v={st.st_mtime_ns}")
+        url = url.toString()
+        self._url_cache[path] = (stamp, url)
+        return url
+
+    @staticmethod
+    def _to_webp(path, st):
+        """Return a WebP copy of a PNG kept in the temp directory.
+
+        The copy is named after the PNG's path, so it is reused (not re-encoded)
+        while it is at least as new as the PNG. It is written under a temporary
+        name and moved into place, so the web view never reads a partial file.
+        Returns the PNG path if transcoding fails.
+        """
+        key = hashlib.blake2b(os.path.abspath(path).encode(), digest_size=8).hexdigest()
+        webp_path = os.path.join(tempfile.gettempdir(), f"geoshift_preview_{key}.webp")
         try:
-            with open(path, "rb") as image_file:
-                encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
-            logger.debug(f"Encoded image: {os.path.basename(path)}")
-            return f"data:image/png;base64,{encoded_string}"
-        except Exception as e:
-            logger.error(f"Error encoding image {path}: {e}")
-            return ""
+            if os.stat(webp_path).st_mtime_ns >= st.st_mtime_ns:
+                return webp_path
+        except OSError:
+            pass
+        fd, tmp_path = tempfile.mkstemp(prefix="geoshift_preview_", suffix=".tmp")
+        os.close(fd)
+        try:
+            with Image.open(path) as img:
+                img.save(tmp_path, 'WEBP', quality=85, method=0)
+            os.replace(tmp_path, webp_path)
+        except OSError as e:
+            logger.warning(f"Could not transcode {path} to WebP: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return path
+        return webp_path
+
+    def _forget_urls(self, layer_info):
+        """Drop cached image URLs for a layer that is going away."""
+        self._url_cache.pop(layer_info['raster_data'].get('preview_path'), None)
+        self._url_cache.pop(layer_info['mask_path'], None)
 
     # Layer management methods
     def add_image_layer(self, name, raster_data, mask_path=None, opacity=1.0, visible=True, render=True):
@@ -139,7 +312,9 @@ class MapWidget(QWidget):
             'mask_path': mask_path,
             'opacity': opacity,
             'visible': visible,
-            'bounds': bounds
+            'bounds': bounds,
+            # Leaflet [[south, west], [north, east]] form, computed once per layer
+            'bounds_ll': _leaflet_bounds(bounds)
         }
         self.layers[name] = layer_info
         if render:
@@ -148,7 +323,7 @@ class MapWidget(QWidget):
     def remove_layer(self, name):
         """Remove a layer by name and re‑render the map."""
         if name in self.layers:
-            del self.layers[name]
+            self._forget_urls(self.layers.pop(name))
             self._render_map()
         else:
             logger.warning(f"Attempted to remove non‑existent layer: {name}")
@@ -157,29 +332,99 @@ class MapWidget(QWidget):
         """Remove all image layers and optionally reset to blank map."""
         self.layers.clear()
         if show_blank:
+            # show_comparison clears without blanking and re-adds the same
+            # files, so only drop cached URLs on a real clear
+            self._url_cache.clear()
             self._show_blank_screen()
 
     def toggle_layer_visibility(self, name, visible):
-        """Toggle visibility of a layer and re‑render the map."""
+        """Toggle visibility of a layer, in place on the live map when possible."""
         if name in self.layers:
             self.layers[name]['visible'] = visible
-            self._render_map()
+            # The slider is bound to the visible layers, so comparison maps are rebuilt
+            if self.comparison_mode or not self._is_live(name):
+                self._render_map()
+                return
+            method = 'addLayer' if visible else 'removeLayer'
+            self._run_live_js("".join(f"{self._js_map}.{method}({var});" for var in self._js_layers[name]))
         else:
             logger.warning(f"Layer not found for visibility toggle: {name}")
 
+    def set_layer_opacity(self, name, opacity):
+        """Set a layer's opacity, in place on the live map when possible."""
+        if name in self.layers:
+            self.layers[name]['opacity'] = opacity
+            if not self._is_live(name):
+                self._render_map()
+                return
+            self._run_live_js(f"{self._js_layers[name][0]}.setOpacity({float(opacity)});")
+        else:
+            logger.warning(f"Layer not found for opacity change: {name}")
+
     def zoom_to_layer(self, name):
         """Zoom the map view to the bounds of the specified layer."""
-        if name in self.layers:
+        if name in self.layers and self._js_map:
             bounds = self.layers[name]['bounds']
             center_lat = (bounds.bottom + bounds.top) / 2
             center_lon = (bounds.left + bounds.right) / 2
-            js = f"map.setView([{center_lat}, {center_lon}], 12);"
+            js = f"{self._js_map}.setView([{center_lat}, {center_lon}], 12);"
             self.web_view.page().runJavaScript(js)
         else:
             logger.warning(f"Cannot zoom to unknown layer: {name}")
 
+    def _is_live(self, name):
+        """True if layer name can be edited in place on the current page."""
+        # A pending render will rebuild the page from self.layers anyway
+        return name in self._js_layers and not self._render_timer.isActive()
+
+    def _run_live_js(self, js):
+        """Apply an in-place edit to the live map and record the state it now shows."""
+        self.web_view.page().runJavaScript(js)
+        self._live_sig = self._render_signature()
+
+    def _render_signature(self):
+        """Build a hashable key describing everything _render_map draws."""
+        entries = []
+        for name, info in self.layers.items():
+            preview_path = info['raster_data'].get('preview_path')
+            mask_path = info['mask_path']
+            entries.append((
+                name, info['visible'], info['opacity'],
+                preview_path, self._file_mtime(preview_path),
+                mask_path, self._file_mtime(mask_path)
+            ))
+        return (self.comparison_mode, tuple(entries))
+
+    @staticmethod
+    def _file_mtime(path):
+        """Return the modification time of path, or None if it is missing."""
+        if not path:
+            return None
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
     def _render_map(self):
+        """Schedule a render; repeated calls before the event loop runs coalesce."""
+        self._render_timer.start()
+
+    def _render_map_now(self):
         """Render the Folium map with current base layer and all active image layers."""
+        self._render_timer.stop()
+        signature = self._render_signature()
+        if signature == self._live_sig:
+            logger.info("Map already shows current layers")
+            return
+        cached = self._html_cache.get(signature)
+        if cached is not None:
+            self._html_cache.move_to_end(signature)
+            cached_html, (self._slider_live, self._js_map, self._js_layers) = cached
+            self._load_html(cached_html)
+            self._live_sig = signature
+            logger.info("Map rendered from cache")
+            return
+
         if self.layers:
             first = next((l for l in self.layers.values() if l['visible']), None)
             if first:
@@ -192,34 +437,49 @@ class MapWidget(QWidget):
         else:
             center_lat, center_lon, zoom = self.base_location[0], self.base_location[1], self.base_zoom
 
-        m = folium.Map(location=[center_lat, center_lon], zoom_start=zoom)
+        # Canvas renderer, and a single named base layer instead of Folium's default plus ours
+        m = folium.Map(location=[center_lat, center_lon], zoom_start=zoom, tiles=None, prefer_canvas=True)
         folium.TileLayer('OpenStreetMap', name='Base Map').add_to(m)
         # Store layer objects for SideBySide
         layer_objects = {}
+        js_layers = {}
+        overlay_count = 0
         for name, info in self.layers.items():
-            if not info['visible']:
-                continue
+            # Hidden layers are still created (show=False) so they can be
+            # toggled back on without regenerating the page
+            visible = info['visible']
             raster = info['raster_data']
-            bounds = [[raster['bounds'].bottom, raster['bounds'].left], [raster['bounds'].top, raster['bounds'].right]]
+            bounds = info['bounds_ll']
             
             layer = folium.raster_layers.ImageOverlay(
-                image=self._get_image_url(raster['preview_path']),
+                image=self._get_image_url(raster['preview_path'], lossy=True),
                 bounds=bounds,
                 opacity=info['opacity'],
-                name=name
+                name=name,
+                show=visible,
+                interactive=False
             )
             layer.add_to(m)
-            layer_objects[name] = layer
+            js_layers[name] = (layer.get_name(),)
+            overlay_count += 1
+            if visible:
+                layer_objects[name] = layer
             
             if info['mask_path'] and os.path.exists(info['mask_path']):
-                folium.raster_layers.ImageOverlay(
+                mask_layer = folium.raster_layers.ImageOverlay(
                     image=self._get_image_url(info['mask_path']),
                     bounds=bounds,
                     opacity=0.6,
-                    name=f"{name} Mask"
-                ).add_to(m)
+                    name=f"{name} Mask",
+                    show=visible,
+                    interactive=False
+                )
+                mask_layer.add_to(m)
+                js_layers[name] += (mask_layer.get_name(),)
+                overlay_count += 1
         
         # Add SideBySide slider if in comparison mode and we have exactly 2 image layers
+        slider_added = False
         if self.comparison_mode and len(layer_objects) >= 2:
             # Assume first two keys are the ones to compare (usually Image A and Image B)
             keys = list(layer_objects.keys())
@@ -230,68 +490,47 @@ class MapWidget(QWidget):
             
             if left_layer and right_layer:
                 logger.info("Adding SideBySide slider plugin")
-                plugins.SideBySideLayers(layer_left=left_layer, layer_right=right_layer).add_to(m)
+                _LocalSideBySideLayers(layer_left=left_layer, layer_right=right_layer).add_to(m)
+                slider_added = True
             else:
                 logger.warning(f"Could not create slider: left_layer={left_layer}, right_layer={right_layer}")
         else:
             logger.info(f"Slider not added: comparison_mode={self.comparison_mode}, layer_count={len(layer_objects)}")
 
 
-        folium.LayerControl(collapsed=False).add_to(m)
-        data = io.BytesIO()
-        m.save(data, close_file=False)
-        html_content = data.getvalue().decode()
-        
-        # Inject Polyfill for ImageOverlay.getContainer (required for SideBySide plugin with newer Leaflet)
-        polyfill = """
-        <script>
-            L.ImageOverlay.prototype.getContainer = function() { return this.getElement(); };
-        </script>
-        """
-        
-        # Add custom CSS to make the slider more visible
-        slider_css = """
-        <style>
-            /* Make the comparison slider more visible */
-            .leaflet-sbs-divider {
-                background-color: white !important;
-                width: 4px !important;
-                box-shadow: 0 0 10px rgba(0,0,0,0.5) !important;
-                cursor: ew-resize !important;
-            }
-            .leaflet-sbs-range {
-                position: absolute;
-                top: 50%;
-                width: 100%;
-                z-index: 999;
-            }
-            /* Add a handle/grip to the slider */
-            .leaflet-sbs-divider:before {
-                content: '⬌';
-                position: absolute;
-                top: 50%;
-                left: 50%;
-                transform: translate(-50%, -50%);
-                background: white;
-                padding: 10px;
-                border-radius: 50%;
-                box-shadow: 0 2px 8px rgba(0,0,0,0.3);
-                font-size: 20px;
-                color: #3498db;
-            }
-        </style>
-        """
-        
-        # Insert before closing head tag
-        if "</head>" in html_content:
-            html_content = html_content.replace("</head>", f"{polyfill}\n{slider_css}\n</head>")
-        else:
-            # Fallback: insert at start of body
-            html_content = html_content.replace("<body>", f"<body>\n{polyfill}")
-            
-        self.web_view.setHtml(html_content)
+        # A layer switcher is only useful with more than one overlay to toggle
+        if overlay_count > 1:
+            folium.LayerControl(collapsed=False).add_to(m)
+        # Emitted in the body: after Leaflet and plugin CSS/JS in the head, before the map script
+        m.get_root().html.add_child(folium.Element(_PAGE_EXTRAS))
+        # Render straight to a str; Map.save would go through a buffer and decode
+        html_content = m.get_root().render()
+
+        live = (slider_added, m.get_name(), js_layers)
+        self._html_cache[signature] = (html_content, live)
+        if len(self._html_cache) > self._html_cache_size:
+            self._html_cache.popitem(last=False)
+
+        self._load_html(html_content)
+        self._slider_live, self._js_map, self._js_layers = live
+        self._live_sig = signature
         logger.info("Map rendered with current layers")
 
+    def _load_html(self, html):
+        """Write the map page to the widget's temp file and navigate to it."""
+        with open(self._html_path, 'w', encoding='utf-8') as f:
+            f.write(html)
+        self.web_view.setUrl(QUrl.fromLocalFile(self._html_path))
+
+    def closeEvent(self, event):
+        """Remove the temporary map page when the widget closes."""
+        self._render_timer.stop()
+        try:
+            os.remove(self._html_path)
+        except OSError:
+            pass
+        super().closeEvent(event)
+
     def show_map(self, raster_data, mask_path=None):
         """Display a single raster (and optional mask) using layer management."""
         logger.info("show_map called")
@@ -312,11 +551,19 @@ class MapWidget(QWidget):
         5. Renders the map with SideBySideLayers plugin (handled in _render_map)
         
         The interactive slider is automatically added by _render_map when comparison_mode is True.
+        If a slider map is already live and only one side's raster changed, that side is
+        swapped in place via update_side instead of regenerating the page.
         """
         logger.info("show_comparison called")
         if not raster_a or not raster_b:
             logger.warning("Missing raster data for comparison")
             return
+        # Validate up front so a half-loaded raster leaves the current map untouched
+        # instead of failing part-way through the layer swap
+        if not all('bounds' in r and 'preview_path' in r for r in (raster_a, raster_b)):
+            logger.warning("Raster data for comparison is missing bounds or preview")
+            return
+        previous = dict(self.layers) if self._slider_live and not self._render_timer.isActive() else {}
         self.clear_all_layers(show_blank=False)
         name_a = raster_a.get('name', 'Image A')
         name_b = raster_b.get('name', 'Image B')
@@ -325,4 +572,31 @@ class MapWidget(QWidget):
         self.add_image_layer(name_b, raster_b, mask_b_path, visible=True, render=False)
         
         self.comparison_mode = True
-        self._render_map()
+        changed = self._changed_side(previous)
+        if changed is not None:
+            self.update_side(*changed)
+        else:
+            self._render_map()
+
+    def _changed_side(self, previous):
+        """Return (slot, raster_data) if exactly one side differs from previous, else None."""
+        if list(previous) != list(self.layers):
+            return None
+        changed = []
+        for slot, name in zip("AB", self.layers):
+            old, new = previous[name], self.layers[name]
+            if (old['mask_path'], old['opacity'], old['visible']) != (new['mask_path'], new['opacity'], new['visible']):
+                return None
+            if old['raster_data'] is not new['raster_data']:
+                changed.append((slot, new['raster_data']))
+        return changed[0] if len(changed) == 1 else None
+
+    def update_side(self, slot, raster_data):
+        """Swap the image shown on one side ('A' or 'B') of the live comparison map."""
+        js = "setSide({}, {}, {});".format(
+            json.dumps(slot),
+            json.dumps(self._get_image_url(raster_data['preview_path'], lossy=True)),
+            json.dumps(_leaflet_bounds(raster_data['bounds']))
+        )
+        self._run_live_js(js)
+        logger.info(f"Swapped comparison side {slot} in place")
@@ -3,25 +3,30 @@ PyQtGraph-based map widget optimized for large GeoTIFF files (up to 5GB per imag
 
 Features:
 - GPU-accelerated rendering via OpenGL
-- Tiled/windowed reading for memory efficiency
+- Decimated overview reads for memory efficiency
 - Interactive pan, zoom, and contrast controls
 - Support for multi-band imagery
 - Direct NumPy array display (no PNG conversion)
 """
 
+import cv2
 import numpy as np
 import pyqtgraph as pg
 from pyqtgraph import ImageView
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QSlider, QPushButton
-from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtCore import Qt, QThread, QTimer, pyqtSignal
 import rasterio
-from rasterio.windows import Window
 from engine.logger import logger
 
+# GDAL settings for loader I/O: multithreaded decompression of tiled/compressed
+# GeoTIFFs. The block cache size is process-wide and is set once at startup
+# (see main.py), not per read.
+_GDAL_ENV = {'GDAL_NUM_THREADS': 'ALL_CPUS'}
+
 
 class TiledRasterLoader:
     """
-    Handles efficient loading of large rasters using tiled/windowed reading.
+    Handles efficient loading of large rasters through decimated overview reads.
     Optimized for 5GB+ GeoTIFF files.
     """
     
@@ -36,103 +41,214 @@ class TiledRasterLoader:
         self.dataset = None
         self.overview_data = None
         self.full_shape = None
+        self._bin_edges = None
+        self._cdf = None
+        self._exact_bins = False  # one bin per integer value (uint8/uint16)
+        self._stretch_buf = None  # float32 scratch reused by contrast_stretch
+        self._stretch_out = None  # uint8 image contrast_stretch writes in place
+        self.stretch_limits = None  # (vmin, vmax) of the last contrast_stretch
         
     def open(self):
         """Open the raster and load overview for initial display."""
         try:
-            self.dataset = rasterio.open(self.path)
+            with rasterio.Env(**_GDAL_ENV):
+                self.dataset = rasterio.open(self.path)
             self.full_shape = (self.dataset.height, self.dataset.width)
             
-            # Load overview (downsampled version) for fast initial display
-            # Use the smallest overview or downsample factor
-            if self.dataset.overviews(1):
-                # Use existing overview
-                overview_level = self.dataset.overviews(1)[-1]  # Smallest overview
-                overview_data = self.dataset.read(
-                    out_shape=(
-                        self.dataset.count,
-                        self.dataset.height // overview_level,
-                        self.dataset.width // overview_level
-                    ),
-                    resampling=rasterio.enums.Resampling.average
-                )
-            else:
-                # Create overview by downsampling
-                downsample = max(self.full_shape) // 2048  # Target ~2048px max dimension
-                downsample = max(1, downsample)
-                overview_data = self.dataset.read(
-                    out_shape=(
-                        self.dataset.count,
-                        self.dataset.height // downsample,
-                        self.dataset.width // downsample
-                    ),
-                    resampling=rasterio.enums.Resampling.average
-                )
-            
-            # Convert to HWC format for display
-            if overview_data.shape[0] <= 4:  # CHW format
-                overview_data = np.transpose(overview_data, (1, 2, 0))
+            # Load overview (downsampled version) for fast initial display,
+            # targeting ~2048px along the longest side
+            level, resampling = self._overview_level(2048)
+            self.overview_data = self._read_display(
+                self.dataset.height // level,
+                self.dataset.width // level,
+                resampling=resampling
+            )
             
-            # Handle different band counts
-            if overview_data.shape[2] > 3:
-                # Take first 3 bands for RGB
-                self.overview_data = overview_data[:, :, :3]
-            elif overview_data.shape[2] == 1:
-                # Grayscale
-                self.overview_data = overview_data[:, :, 0]
-            else:
-                self.overview_data = overview_data
-            
-            logger.info(f"Loaded overview: {self.overview_data.shape}, dtype: {self.overview_data.dtype}")
+            logger.info("Loaded overview: %s, dtype: %s", self.overview_data.shape, self.overview_data.dtype)
+            self._build_histogram()
             return True
             
         except Exception as e:
-            logger.error(f"Error opening raster: {e}")
+            logger.error("Error opening raster: %s", e)
             return False
     
-    def read_window(self, row_off, col_off, height, width):
+    def _overview_level(self, target):
         """
-        Read a specific window/tile from the raster.
+        Pick the decimation factor for a preview of about `target` pixels.
+        
+        Snaps to the largest stored overview that is no coarser than needed, so
+        GDAL can copy that level with nearest resampling instead of averaging
+        the already-averaged overview again. Without a usable overview, falls
+        back to an averaged read at the plain downsample factor.
         
-        Args:
-            row_off, col_off: Offset in pixels
-            height, width: Window size in pixels
-            
         Returns:
-            NumPy array of the requested window
+            (factor, resampling) tuple
         """
-        if not self.dataset:
-            return None
+        wanted = max(1, max(self.full_shape) // target)
+        levels = [o for o in self.dataset.overviews(1) if o <= wanted]
+        if levels:
+            return max(levels), rasterio.enums.Resampling.nearest
+        return wanted, rasterio.enums.Resampling.average
+    
+    def _band_indexes(self):
+        """Bands to read for display: the first three for RGB, else all (1-2)."""
+        return [1, 2, 3] if self.dataset.count >= 3 else list(range(1, self.dataset.count + 1))
+    
+    def _read_display(self, out_height, out_width, resampling=rasterio.enums.Resampling.nearest):
+        """
+        Read the display bands as a contiguous HWC array (2D for a single band).
         
-        try:
-            window = Window(col_off, row_off, width, height)
-            data = self.dataset.read(window=window)
-            
-            # Convert to HWC
-            if data.shape[0] <= 4:
-                data = np.transpose(data, (1, 2, 0))
-            
-            # Handle bands
-            if data.shape[2] > 3:
-                data = data[:, :, :3]
-            elif data.shape[2] == 1:
-                data = data[:, :, 0]
-            
-            return data
-            
-        except Exception as e:
-            logger.error(f"Error reading window: {e}")
-            return None
+        Each band is read straight into its channel of one preallocated
+        buffer, so there is no CHW intermediate to transpose and copy.
+        """
+        indexes = self._band_indexes()
+        # rasterio.Env is scoped to the calling thread, so enter it per read
+        # rather than holding it open between open() and close()
+        with rasterio.Env(**_GDAL_ENV):
+            if len(indexes) == 1:
+                return self.dataset.read(
+                    1, out_shape=(out_height, out_width), resampling=resampling
+                )
+            data = np.empty((out_height, out_width, len(indexes)), dtype=self.dataset.dtypes[0])
+            for i, band in enumerate(indexes):
+                self.dataset.read(band, out=data[:, :, i], resampling=resampling)
+        return data
     
     def get_overview(self):
         """Get the overview/downsampled version for initial display."""
         return self.overview_data
     
+    def _build_histogram(self, bins=1024, max_samples=1_000_000):
+        """
+        Cache a cumulative histogram of the overview so percentile lookups
+        on every contrast slider move cost O(bins) instead of a full sort.
+        """
+        # Subsample whole pixels: a flat stride over interleaved HWC data would
+        # land on the same band whenever it is a multiple of the band count
+        data = self.overview_data
+        pixels = data.reshape(-1, data.shape[-1]) if data.ndim == 3 else data.reshape(-1, 1)
+        sample = pixels[::max(1, data.size // max_samples)].ravel()
+        if sample.dtype.kind == 'f':
+            sample = sample[np.isfinite(sample)]
+        if sample.size == 0:
+            self._bin_edges = self._cdf = None
+            return
+        self._exact_bins = sample.dtype in (np.uint8, np.uint16)
+        if self._exact_bins:
+            # Count every value directly: exact, and no float promotion
+            hist = np.bincount(sample, minlength=1 << (8 * sample.dtype.itemsize))
+            self._bin_edges = np.arange(hist.size + 1)
+        else:
+            hist, self._bin_edges = np.histogram(sample, bins=bins)
+        self._cdf = np.cumsum(hist, dtype=np.float64)
+        self._cdf /= self._cdf[-1]
+    
+    def get_percentiles(self, min_pct, max_pct):
+        """
+        Approximate the overview's min/max percentiles from the cached histogram.
+        
+        Returns:
+            (vmin, vmax) tuple, or None if no overview is loaded
+        """
+        if self._cdf is None:
+            return None
+        # First bin past min_pct, first bin that reaches max_pct (so 0/100 are the data range)
+        lo = np.searchsorted(self._cdf, min_pct / 100.0, side='right')
+        hi = np.searchsorted(self._cdf, max_pct / 100.0, side='left')
+        last = len(self._cdf) - 1
+        lo, hi = min(lo, last), min(hi, last)
+        if self._exact_bins:
+            return self._bin_edges[lo], self._bin_edges[hi]
+        return self._bin_edges[lo], self._bin_edges[hi + 1]
+    
+    def stretch_is_current(self, min_pct, max_pct):
+        """
+        True if these percentiles map to the limits of the last stretch.
+        
+        Neighbouring slider values often land in the same histogram bin, in
+        which case the displayed image is already correct.
+        """
+        return self.stretch_limits is not None and self.get_percentiles(min_pct, max_pct) == self.stretch_limits
+    
     def close(self):
         """Close the raster dataset."""
         if self.dataset:
             self.dataset.close()
             self.dataset = None
+        self._bin_edges = self._cdf = None
+        self._stretch_buf = self._stretch_out = None
+        self.stretch_limits = None
+
+
+def contrast_stretch(loader, min_pct, max_pct):
+    """
+    Stretch a loader's overview between two percentiles to uint8.
+    
+    Shared by PyQtGraphMapWidget and ComparisonWidget.
+    
+    Args:
+        loader: Opened TiledRasterLoader
+        min_pct: Lower percentile (0-100)
+        max_pct: Upper percentile (0-100)
+        
+    Returns:
+        Contrast-stretched uint8 array. This is the loader's persistent output
+        buffer, rewritten in place by the next call, so a view already showing
+        it only needs a repaint.
+    """
+    data = loader.get_overview()
+    limits = loader.get_percentiles(min_pct, max_pct)
+    if limits is None:
+        return data
+    
+    loader.stretch_limits = limits
+    vmin, vmax = limits
+    out = loader._stretch_out
+    if out is None or out.shape != data.shape:
+        out = loader._stretch_out = np.empty(data.shape, dtype=np.uint8)
+    if vmax <= vmin:
+        np.copyto(out, data, casting='unsafe')
+        return out
+    
+    # Small integer types: stretch every possible value once and gather
+    if data.dtype in (np.uint8, np.uint16):
+        lut = np.arange(1 << (8 * data.dtype.itemsize), dtype=np.float32)
+        lut -= vmin
+        lut *= 255.0 / (vmax - vmin)
+        np.clip(lut, 0, 255, out=lut)
+        return np.take(lut.astype(np.uint8), data, out=out)
+    
+    # Clamp the low end into a float32 buffer kept on the loader, then let
+    # OpenCV scale, saturate at 255 and cast to uint8 in one fused pass
+    buf = loader._stretch_buf
+    if buf is None or buf.shape != data.shape:
+        buf = loader._stretch_buf = np.empty(data.shape, dtype=np.float32)
+    np.maximum(data, vmin, out=buf, dtype=np.float32)
+    scale = 255.0 / (vmax - vmin)
+    return cv2.convertScaleAbs(buf, dst=out, alpha=scale, beta=-vmin * scale)
+
+
+class OverviewLoader(QThread):
+    """Thread for opening a raster and stretching its overview without blocking UI."""
+    loaded = pyqtSignal(object, object)  # opened TiledRasterLoader, stretched overview
+    error = pyqtSignal(str)
+    
+    def __init__(self, path, min_pct, max_pct, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.min_pct = min_pct
+        self.max_pct = max_pct
+    
+    def run(self):
+        loader = TiledRasterLoader(self.path)
+        if not loader.open():
+            self.error.emit("Failed to open raster")
+            return
+        if loader.get_overview() is None:
+            loader.close()
+            self.error.emit("Failed to load overview")
+            return
+        self.loaded.emit(loader, contrast_stretch(loader, self.min_pct, self.max_pct))
 
 
 class PyQtGraphMapWidget(QWidget):
@@ -151,6 +267,8 @@ class PyQtGraphMapWidget(QWidget):
         # State
         self.current_raster = None
         self.raster_loader = None
+        self._load_thread = None  # latest OverviewLoader; older results are ignored
+        self._load_threads = set()  # every OverviewLoader still running, superseded or not
         self.layers = {}  # name -> loader
         
     def setup_ui(self):
@@ -159,6 +277,12 @@ class PyQtGraphMapWidget(QWidget):
         layout.setContentsMargins(0, 0, 0, 0)
         layout.setSpacing(0)
         
+        # Restretch at most once per 30 ms while a contrast slider is dragged
+        self._contrast_timer = QTimer(self)
+        self._contrast_timer.setSingleShot(True)
+        self._contrast_timer.setInterval(30)
+        self._contrast_timer.timeout.connect(self.update_contrast)
+        
         # Main ImageView
         self.image_view = ImageView()
         self.image_view.ui.roiBtn.hide()  # Hide ROI button for now
@@ -180,14 +304,14 @@ class PyQtGraphMapWidget(QWidget):
         self.contrast_min_slider = QSlider(Qt.Horizontal)
         self.contrast_min_slider.setRange(0, 100)
         self.contrast_min_slider.setValue(2)  # 2nd percentile
-        self.contrast_min_slider.valueChanged.connect(self.update_contrast)
+        self.contrast_min_slider.valueChanged.connect(lambda _: self._contrast_timer.start())
         controls_layout.addWidget(QLabel("Min:"))
         controls_layout.addWidget(self.contrast_min_slider)
         
         self.contrast_max_slider = QSlider(Qt.Horizontal)
         self.contrast_max_slider.setRange(0, 100)
         self.contrast_max_slider.setValue(98)  # 98th percentile
-        self.contrast_max_slider.valueChanged.connect(self.update_contrast)
+        self.contrast_max_slider.valueChanged.connect(lambda _: self._contrast_timer.start())
         controls_layout.addWidget(QLabel("Max:"))
         controls_layout.addWidget(self.contrast_max_slider)
         
@@ -203,6 +327,9 @@ class PyQtGraphMapWidget(QWidget):
         """
         Display a raster image.
         
+        The raster is opened and stretched on a worker thread; the image is
+        swapped in when it is ready, and results of superseded loads are dropped.
+        
         Args:
             raster_data: Dict with 'path', 'name', etc.
         """
@@ -210,72 +337,83 @@ class PyQtGraphMapWidget(QWidget):
             logger.warning("Invalid raster data")
             return
         
-        try:
-            # Close previous raster if any
-            if self.raster_loader:
-                self.raster_loader.close()
-            
-            # Load new raster
-            self.raster_loader = TiledRasterLoader(raster_data['path'])
-            if not self.raster_loader.open():
-                logger.error("Failed to open raster")
+        # Reselecting the raster already shown (or being loaded) keeps its loader
+        path = raster_data['path']
+        if self._load_thread is not None:
+            if self._load_thread.path == path:
                 return
-            
-            # Get overview for display
-            overview = self.raster_loader.get_overview()
-            
-            if overview is None:
-                logger.error("Failed to load overview")
-                return
-            
-            # Apply contrast stretch
-            stretched = self.apply_contrast_stretch(overview)
-            
-            # Display
-            self.image_view.setImage(stretched, autoRange=True, autoLevels=False)
+        elif self.raster_loader and self.current_raster and self.current_raster.get('path') == path:
             self.current_raster = raster_data
-            
-            logger.info(f"Displayed raster: {raster_data.get('name', 'Unknown')}")
-            
-        except Exception as e:
-            logger.error(f"Error displaying raster: {e}")
+            self.update_contrast()
+            return
+        
+        thread = OverviewLoader(
+            path,
+            self.contrast_min_slider.value(),
+            self.contrast_max_slider.value(),
+            self
+        )
+        thread.loaded.connect(
+            lambda loader, stretched: self._on_raster_loaded(thread, raster_data, loader, stretched)
+        )
+        thread.error.connect(lambda err: self._on_raster_error(thread, err))
+        # Keep superseded loads referenced until they finish, so no QThread
+        # is destroyed while still running
+        thread.finished.connect(lambda: self._load_threads.discard(thread))
+        thread.finished.connect(thread.deleteLater)
+        self._load_threads.add(thread)
+        self._load_thread = thread
+        thread.start()
     
-    def apply_contrast_stretch(self, data):
+    def _on_raster_loaded(self, thread, raster_data, loader, stretched):
+        """Show a finished load unless a newer show_raster/clear superseded it."""
+        if thread is not self._load_thread:
+            loader.close()
+            return
+        self._load_thread = None
+        
+        # Close previous raster if any
+        if self.raster_loader:
+            self.raster_loader.close()
+        self.raster_loader = loader
+        
+        # Display
+        self.image_view.setImage(stretched, autoRange=True, autoLevels=False, levels=(0, 255))
+        self.current_raster = raster_data
+        
+        logger.info("Displayed raster: %s", raster_data.get('name', 'Unknown'))
+    
+    def _on_raster_error(self, thread, err):
+        """Log a failed load and let the same path be requested again."""
+        logger.error("Error displaying raster: %s", err)
+        if thread is self._load_thread:
+            self._load_thread = None
+    
+    def apply_contrast_stretch(self, loader):
         """
-        Apply contrast stretching to image data.
+        Apply contrast stretching to a loader's overview.
         
         Args:
-            data: NumPy array
+            loader: Opened TiledRasterLoader
             
         Returns:
             Contrast-stretched array
         """
-        if data is None or data.size == 0:
-            return data
-        
-        # Get percentile values
-        min_pct = self.contrast_min_slider.value()
-        max_pct = self.contrast_max_slider.value()
-        
-        # Calculate percentiles
-        vmin = np.percentile(data, min_pct)
-        vmax = np.percentile(data, max_pct)
-        
-        # Clip and normalize
-        stretched = np.clip(data, vmin, vmax)
-        if vmax > vmin:
-            stretched = ((stretched - vmin) / (vmax - vmin) * 255).astype(np.uint8)
-        else:
-            stretched = data.astype(np.uint8)
-        
-        return stretched
+        return contrast_stretch(loader, self.contrast_min_slider.value(), self.contrast_max_slider.value())
     
     def update_contrast(self):
         """Update contrast when sliders change."""
-        if self.raster_loader and self.raster_loader.overview_data is not None:
-            overview = self.raster_loader.get_overview()
-            stretched = self.apply_contrast_stretch(overview)
-            self.image_view.setImage(stretched, autoRange=False, autoLevels=False)
+        loader = self.raster_loader
+        if loader and loader.overview_data is not None and not loader.stretch_is_current(
+                self.contrast_min_slider.value(), self.contrast_max_slider.value()):
+            stretched = self.apply_contrast_stretch(loader)
+            if stretched is self.image_view.image:
+                # Rewritten in place: repaint without handing pyqtgraph a new array.
+                # updateImage() alone leaves the histogram stale, so notify it too
+                self.image_view.imageItem.updateImage()
+                self.image_view.imageItem.sigImageChanged.emit()
+            else:
+                self.image_view.setImage(stretched, autoRange=False, autoLevels=False, levels=(0, 255))
     
     def reset_view(self):
         """Reset view to show entire image."""
@@ -292,6 +430,7 @@ class PyQtGraphMapWidget(QWidget):
     
     def clear_all_layers(self):
         """Clear all displayed layers."""
+        self._load_thread = None
         if self.raster_loader:
             self.raster_loader.close()
             self.raster_loader = None
@@ -301,6 +440,14 @@ class PyQtGraphMapWidget(QWidget):
         self.layers.clear()
         logger.info("Cleared all layers")
     
+    def closeEvent(self, event):
+        """Wait for pending loads so their threads outlive neither the widget nor the app."""
+        self._contrast_timer.stop()
+        self._load_thread = None
+        for thread in list(self._load_threads):
+            thread.wait()
+        super().closeEvent(event)
+    
     def show_map(self, raster_data, mask_path=None):
         """Display a single raster (compatibility with old interface)."""
         self.show_raster(raster_data)
@@ -1,18 +1,43 @@
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QLabel, QSlider, QGroupBox
 )
-from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
+
+# Shared by all sliders; set once on the group box and inherited by its children
+_SLIDER_STYLE = """
+    QSlider::groove:horizontal {
+        border: 1px solid #999999;
+        height: 8px;
+        background: #34495e;
+        margin: 2px 0;
+        border-radius: 4px;
+    }
+    QSlider::handle:horizontal {
+        background: #2980b9;
+        border: 1px solid #2980b9;
+        width: 18px;
+        margin: -5px 0;
+        border-radius: 9px;
+    }
+    QSlider::handle:horizontal:hover {
+        background: #3498db;
+    }
+"""
 
 class SymbologyPanel(QWidget):
     """Panel for adjusting image visualization parameters."""
     
-    # Signals emitted when parameters change
-    opacity_changed = pyqtSignal(float)  # 0.0 to 1.0
-    brightness_changed = pyqtSignal(float)  # -1.0 to 1.0
-    contrast_changed = pyqtSignal(float)  # 0.0 to 2.0
+    # Emitted at most once per frame with the parameters changed since the last
+    # emission: 'opacity' (0.0 to 1.0), 'brightness' (-1.0 to 1.0), 'contrast' (0.0 to 2.0)
+    params_changed = pyqtSignal(dict)
     
     def __init__(self, parent=None):
         super().__init__(parent)
+        self._pending = {}
+        self._emit_timer = QTimer(self)
+        self._emit_timer.setSingleShot(True)
+        self._emit_timer.setInterval(16)
+        self._emit_timer.timeout.connect(self._emit_params)
         self.init_ui()
     
     def init_ui(self):
@@ -34,7 +59,7 @@ class SymbologyPanel(QWidget):
                 left: 10px;
                 padding: 0 5px;
             }
-        """)
+        """ + _SLIDER_STYLE)
         group_layout = QVBoxLayout()
         
         # Opacity slider
@@ -44,7 +69,6 @@ class SymbologyPanel(QWidget):
         self.opacity_slider.setMinimum(0)
         self.opacity_slider.setMaximum(100)
         self.opacity_slider.setValue(100)
-        self.opacity_slider.setStyleSheet(self._slider_style())
         self.opacity_slider.valueChanged.connect(
             lambda v: self._on_opacity_changed(v, opacity_label)
         )
@@ -59,7 +83,6 @@ class SymbologyPanel(QWidget):
         self.brightness_slider.setMinimum(-100)
         self.brightness_slider.setMaximum(100)
         self.brightness_slider.setValue(0)
-        self.brightness_slider.setStyleSheet(self._slider_style())
         self.brightness_slider.valueChanged.connect(
             lambda v: self._on_brightness_changed(v, brightness_label)
         )
@@ -74,7 +97,6 @@ class SymbologyPanel(QWidget):
         self.contrast_slider.setMinimum(0)
         self.contrast_slider.setMaximum(200)
         self.contrast_slider.setValue(100)
-        self.contrast_slider.setStyleSheet(self._slider_style())
         self.contrast_slider.valueChanged.connect(
             lambda v: self._on_contrast_changed(v, contrast_label)
         )
@@ -86,38 +108,27 @@ class SymbologyPanel(QWidget):
         layout.addWidget(group)
         layout.addStretch()
     
-    def _slider_style(self):
-        return """
-            QSlider::groove:horizontal {
-                border: 1px solid #999999;
-                height: 8px;
-                background: #34495e;
-                margin: 2px 0;
-                border-radius: 4px;
-            }
-            QSlider::handle:horizontal {
-                background: #2980b9;
-                border: 1px solid #2980b9;
-                width: 18px;
-                margin: -5px 0;
-                border-radius: 9px;
-            }
-            QSlider::handle:horizontal:hover {
-                background: #3498db;
-            }
-        """
-    
     def _on_opacity_changed(self, value, label):
         label.setText(f"Opacity: {value}%")
-        self.opacity_changed.emit(value / 100.0)
+        self._queue_param('opacity', value / 100.0)
     
     def _on_brightness_changed(self, value, label):
         label.setText(f"Brightness: {value:+d}%")
-        self.brightness_changed.emit(value / 100.0)
+        self._queue_param('brightness', value / 100.0)
     
     def _on_contrast_changed(self, value, label):
         label.setText(f"Contrast: {value}%")
-        self.contrast_changed.emit(value / 100.0)
+        self._queue_param('contrast', value / 100.0)
+    
+    def _queue_param(self, name, value):
+        """Record a change and emit all pending changes together on the next frame."""
+        self._pending[name] = value
+        if not self._emit_timer.isActive():
+            self._emit_timer.start()
+    
+    def _emit_params(self):
+        params, self._pending = self._pending, {}
+        self.params_changed.emit(params)
     
     def reset(self):
         """Reset all sliders to default values."""